@@ -0,0 +1,198 @@
+'''
+Time and memory of the stages of the pipeline on synthetic data sets of
+growing size: loading, the temporal splits, every transform stage, the
+fits of a representative grid and the evaluation metrics
+'''
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from collections import OrderedDict
+from scipy import sparse
+import argparse
+import gc
+import logging
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+import yaml
+import main
+import transformer
+from pipeline import evaluator
+from pipeline import executor
+from pipeline import loader
+from pipeline import model_factory
+from pipeline.community_mean_imputer import community_mean_imputer
+from pipeline.minmax_scaler import min_max_transformation
+from benchmarks import synthetic
+
+logger = logging.getLogger('benchmarks')
+ch = logging.StreamHandler(sys.stdout)
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+logger.setLevel(logging.INFO)
+
+# rows of the data sets benchmarked by default
+ROWS = [10000, 100000, 1000000]
+# a small grid with one model of every family the neighbors excepted, whose
+# brute force search does not finish at a million rows
+MODELS = OrderedDict([('DecisionTreeClassifier', {'max_depth': [5], 'random_state': [0]}),
+                      ('RandomForestClassifier', {'n_estimators': [100], 'max_depth': [10],
+                                                  'n_jobs': [-1], 'random_state': [0]}),
+                      ('LogisticRegression', {'penalty': ['l2'], 'C': [1]}),
+                      ('GradientBoostingClassifier', {'n_estimators': [50], 'random_state': [0]}),
+                      ('GaussianNB', None)])
+COLUMNS = ['rows', 'stage', 'seconds', 'peak_mb', 'peak_rss_delta_mb']
+
+
+class profiler():
+
+    '''
+    The class runs the stages of one data set and keeps a row of COLUMNS
+    per stage
+    '''
+
+    def __init__(self, n_rows, trace=True):
+        '''
+        Inputs:
+            n_rows: rows of the data set
+            trace: measure the peak of the allocations with tracemalloc,
+                   which slows the stages allocating many small objects
+        '''
+        self.n_rows = n_rows
+        self.trace = trace
+        self.records = []
+
+    def run(self, stage, function, *args):
+        '''
+        Run and measure one stage
+        Inputs:
+            stage: name of the stage
+            function: the stage, called with args
+        Returns: what the stage returns
+        '''
+        gc.collect()
+        # the rise of the resident memory over this stage alone
+        rss = executor.reset_peak_rss()
+        if self.trace:
+            tracemalloc.start()
+        start = time.perf_counter()
+        result = function(*args)
+        seconds = time.perf_counter() - start
+        peak = float('nan')
+        if self.trace:
+            peak = tracemalloc.get_traced_memory()[1] / 2.0 ** 20
+            tracemalloc.stop()
+        self.records.append([self.n_rows, stage, seconds, peak, executor.peak_rss_mb() - rss])
+        logger.info('{} rows, {}: {:.3f}s, peak {:.1f} MB'.format(self.n_rows, stage, seconds, peak))
+        return result
+
+
+def impute(trans_configs, X_train, X_test):
+    '''
+    The imputation stage of transformer.transform
+    '''
+    imputer = community_mean_imputer()
+    X_train, X_test = imputer.filled_categorical(X_train, X_test, trans_configs['imputation']['cols'])
+    X_train = imputer.train_regional_mean(X_train, trans_configs['imputation']['loc_col'][0],
+                                          trans_configs['imputation']['time_col'][0])
+    return X_train, transformer.impute_test(trans_configs, imputer, X_test)
+
+
+def benchmark(n_rows, config, work_dir, models, trace=True, random_state=0):
+    '''
+    Measure every stage on a synthetic data set, generated once per size
+    and seed in work_dir
+    Inputs:
+        n_rows: rows of the data set
+        config: config dictionary giving the schema of the data
+        work_dir: directory of the data sets
+        models: models section of the fitted grid
+        trace: measure the allocations with tracemalloc
+        random_state: seed of the data set and of the scores
+    Returns: list of rows of COLUMNS
+    '''
+    input_path = os.path.join(work_dir, 'synthetic_{}_{}.csv'.format(n_rows, random_state))
+    if not os.path.exists(input_path):
+        synthetic.generate(n_rows / float(synthetic.BASE_ROWS), config, random_state).to_csv(
+            input_path + '.tmp', index=False)
+        os.rename(input_path + '.tmp', input_path)
+    config = synthetic.make_config(input_path, os.path.join(work_dir, 'output'), models, config)
+    cols_config, time_config, trans_configs = config['cols'], config['time'], config['transform']
+    profile = profiler(n_rows, trace)
+
+    df = profile.run('load', loader.load_dataset, {'input_path': input_path}, cols_config,
+                     trans_configs)
+    splits = profile.run('split', lambda: list(main.split(cols_config, time_config, df)))
+    # the last split trains on the most rows
+    X_train, X_test, y_train, y_test = splits[-1]
+    del splits
+    X_train, X_test = profile.run('impute', impute, trans_configs, X_train.copy(), X_test.copy())
+    time_column = trans_configs['imputation']['time_col'][0]
+    X_train = X_train.drop(columns=[time_column])
+    X_test = X_test.drop(columns=[time_column])
+    continuous_columns = transformer.get_continuous_columns(trans_configs, X_train)
+    X_train, X_test = profile.run('scale', min_max_transformation, X_train, X_test,
+                                  continuous_columns)
+    X_train, X_test = profile.run('encode', transformer.encode, trans_configs, X_train, X_test)
+    if not sparse.issparse(X_train):
+        X_train = np.asarray(X_train, dtype=np.float64)
+        X_test = np.asarray(X_test, dtype=np.float64)
+
+    for name, model in model_factory.get_models(models):
+        profile.run('fit {}'.format(model), executor.fit_and_predict, name, model,
+                    X_train, y_train, X_test)
+
+    y_score = np.random.RandomState(random_state).rand(len(y_test))
+    matrix_configs = config['matrix']
+    profile.run('metrics', main.get_matrix, None, y_score, y_test, 'benchmark', 'benchmark',
+                1, 0, matrix_configs)
+    profile.run('curve', evaluator.precision_recall_n_curve, y_test, y_score)
+    return profile.records
+
+
+def run(args):
+    '''
+    Benchmark every size and save the measures
+
+    Input:
+        args: command line arguments, see the parser below
+    Return:
+        the measures as a dataframe
+    '''
+    config = synthetic.schema(args.config)
+    models = MODELS
+    if args.models:
+        with open(args.models) as models_file:
+            models = yaml.safe_load(models_file)['models']
+    work_dir = args.work_dir or tempfile.mkdtemp()
+    if not os.path.exists(work_dir):
+        os.makedirs(work_dir)
+    records = []
+    for n_rows in args.rows:
+        records.extend(benchmark(n_rows, config, work_dir, models, not args.no_trace, args.seed))
+    results = pd.DataFrame(records, columns=COLUMNS)
+    results.to_csv(args.output or os.path.join(work_dir, 'benchmarks.csv'), index=False)
+    print(results.pivot_table(index='stage', columns='rows',
+                              values=['seconds', 'peak_mb', 'peak_rss_delta_mb'],
+                              sort=False).to_string(float_format='{:.3f}'.format))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Time and memory of the stages of the pipeline on synthetic data')
+    parser.add_argument('--rows', dest='rows', type=int, nargs='+', default=ROWS,
+                        help='rows of the data sets')
+    parser.add_argument('--config', dest='config', default=synthetic.SCHEMA_CONFIG,
+                        help='config file whose cols, transform, time and matrix sections are used')
+    parser.add_argument('--models', dest='models', default=None,
+                        help='config file whose models section replaces the default grid')
+    parser.add_argument('--work-dir', dest='work_dir', default=None,
+                        help='directory keeping the data sets between runs, a new temporary one by default')
+    parser.add_argument('--output', dest='output', default=None,
+                        help='csv of the measures, benchmarks.csv in the work directory by default')
+    parser.add_argument('--no-trace', dest='no_trace', action='store_true',
+                        help='skip tracemalloc, for timings without its overhead')
+    parser.add_argument('--seed', dest='seed', type=int, default=0, help='seed of the data sets')
+    run(parser.parse_args())
@@ -0,0 +1,169 @@
+'''
+Synthetic business licenses with the columns of the full data set: the
+ACS, 311 and crime features of the zip code and year of every license,
+its description, zip code and ward, its year and whether it dies, at any
+number of rows, for the tests and the benchmarks
+'''
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import argparse
+import copy
+import logging
+import numpy as np
+import pandas as pd
+import yaml
+
+logger = logging.getLogger('synthetic data')
+ch = logging.StreamHandler(sys.stdout)
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+logger.setLevel(logging.INFO)
+
+# the config with every feature of the full data set, its cols section is
+# the schema of the synthetic rows
+SCHEMA_CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             'cofigs', 'acs_311_crime_geo.yml')
+# rows of scale 1
+BASE_ROWS = 10000
+# the zip codes of Chicago kept by data_collector/preprocess_business.py
+ZIP_CODES = [code for code in list(range(60601, 60662)) + [60706, 60707, 60803, 60804, 60827]
+             if code not in (60627, 60635, 60650, 60658)]
+WARDS = list(range(1, 51))
+APPLICATION_TYPES = ['RENEW', 'ISSUE', 'C_LOC', 'C_CAPA', 'C_EXPA', 'C_SBA']
+APPLICATION_SHARES = [0.7, 0.2, 0.05, 0.02, 0.02, 0.01]
+# the most common descriptions, the long tail is numbered
+LICENSE_DESCRIPTIONS = ['Limited Business License', 'Retail Food Establishment', 'Tobacco',
+                        'Consumption on Premises - Incidental Activity', 'Package Goods',
+                        'Public Place of Amusement', 'Motor Vehicle Repair', 'Home Occupation',
+                        'Peddler, non-food', "Children's Services Facility License"]
+N_DESCRIPTIONS = 120
+# share of the area features missing from a row
+MISSING_SHARE = 0.05
+
+
+def schema(config_path=SCHEMA_CONFIG):
+    '''
+    Read the columns of the synthetic rows from a config
+    Inputs:
+        config_path: yml file with cols, transform and time sections
+    Returns: the config as a dictionary
+    '''
+    with open(config_path) as config_file:
+        return yaml.safe_load(config_file)
+
+
+def area_values(col, size, random_state):
+    '''
+    Values of an area feature, shaped after its name
+    Inputs:
+        col: the column
+        size: number of values
+        random_state: numpy RandomState
+    Returns: array of floats
+    '''
+    if col.endswith('per capita'):
+        return random_state.gamma(2.0, 0.01, size)
+    if 'rate' in col or col == 'gini index':
+        return random_state.beta(2.0, 5.0, size)
+    if col == 'total population':
+        return np.round(random_state.lognormal(10.5, 0.5, size))
+    return random_state.lognormal(10.8, 0.6, size)
+
+
+def generate(scale=1.0, config=None, random_state=0):
+    '''
+    Draw a synthetic data set
+    Inputs:
+        scale: the data set has BASE_ROWS * scale rows
+        config: config dictionary giving the schema, None reads SCHEMA_CONFIG
+        random_state: seed of the draws
+    Returns: dataframe with the x_cols and the y_col of the config
+    '''
+    config = config or schema()
+    cols_config = config['cols']
+    time_col = cols_config.get('time_col', ['year'])[0]
+    y_col = cols_config['y_col'][0]
+    categorical = set(config['transform']['dummy']['cols']) | set(
+        config['transform']['imputation']['cols'])
+    area_cols = [col for col in cols_config['x_cols']
+                 if col not in categorical and col not in (time_col, 'duration')]
+    random_state = np.random.RandomState(random_state)
+    n_rows = int(BASE_ROWS * scale)
+    years = np.arange(config['time']['start_year'], config['time']['end_year'] + 1)
+    logger.info('drawing {} rows of {} columns'.format(n_rows, len(cols_config['x_cols']) + 1))
+
+    # area features of every zip code and year
+    n_cells = len(ZIP_CODES) * len(years)
+    cells = pd.DataFrame(dict((col, area_values(col, n_cells, random_state)) for col in area_cols))
+    standardized = ((cells - cells.mean()) / cells.std()).values
+    cell_risk = standardized.dot(random_state.normal(0.0, 0.3, len(area_cols))) \
+        if area_cols else np.zeros(n_cells)
+
+    # every zip code lies in a few wards
+    ward_of_zip = random_state.choice(WARDS, (len(ZIP_CODES), 3))
+    zip_index = random_state.randint(len(ZIP_CODES), size=n_rows)
+    year_index = random_state.randint(len(years), size=n_rows)
+    cell = zip_index * len(years) + year_index
+    descriptions = LICENSE_DESCRIPTIONS + ['license type {}'.format(i) for i in
+                                           range(len(LICENSE_DESCRIPTIONS), N_DESCRIPTIONS)]
+    # a few descriptions cover most licenses
+    shares = 1.0 / np.arange(1, N_DESCRIPTIONS + 1)
+    description_index = random_state.choice(N_DESCRIPTIONS, n_rows, p=shares / shares.sum())
+    application = random_state.choice(len(APPLICATION_TYPES), n_rows, p=APPLICATION_SHARES)
+    duration = random_state.randint(1, 1096, n_rows).astype(float)
+
+    values = {'duration': duration,
+              'application type': np.asarray(APPLICATION_TYPES)[application],
+              'conditional approval': np.where(random_state.rand(n_rows) < 0.05, 'Y', 'N'),
+              'license description': np.asarray(descriptions)[description_index],
+              'zip code': np.asarray(ZIP_CODES)[zip_index],
+              'ward': ward_of_zip[zip_index, random_state.randint(3, size=n_rows)],
+              time_col: years[year_index]}
+    missing = random_state.rand(n_rows, len(area_cols)) < MISSING_SHARE
+    for position, col in enumerate(area_cols):
+        values[col] = np.where(missing[:, position], np.nan, cells[col].values[cell])
+    df = pd.DataFrame(dict((col, values[col]) for col in cols_config['x_cols']))
+
+    # new and short lived licenses in risky areas die more often
+    logit = (-1.0 + cell_risk[cell] + random_state.normal(0.0, 0.5, N_DESCRIPTIONS)[description_index]
+             + 0.8 * (application == APPLICATION_TYPES.index('ISSUE')) - duration / 730.0)
+    df[y_col] = (random_state.rand(n_rows) < 1.0 / (1.0 + np.exp(-logit))).astype(int)
+    return df
+
+
+def make_config(input_path, out_dir, models=None, config=None):
+    '''
+    A config running the pipeline on a synthetic data set
+    Inputs:
+        input_path: the csv of the synthetic data set
+        out_dir: directory of the results and the curves
+        models: models section, None keeps the one of the schema config
+        config: config dictionary giving the schema, None reads SCHEMA_CONFIG
+    Returns: the config as a dictionary
+    '''
+    config = copy.deepcopy(config or schema())
+    config['io'] = {'input_path': input_path}
+    if models is not None:
+        config['models'] = models
+    out_dir = os.path.join(out_dir, '')
+    config['matrix']['out_path'] = out_dir + 'performance/'
+    config['matrix']['roc_path'] = out_dir + 'roc/'
+    config['matrix']['pr_path'] = out_dir + 'pr/'
+    for key in ('out_path', 'roc_path', 'pr_path'):
+        if not os.path.exists(config['matrix'][key]):
+            os.makedirs(config['matrix'][key])
+    return config
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Write a synthetic data set with the columns of the full data set')
+    parser.add_argument('--scale', dest='scale', type=float, default=1.0,
+                        help='the data set has {} rows per unit of scale'.format(BASE_ROWS))
+    parser.add_argument('--output', dest='output', default='./data/synthetic.csv',
+                        help='csv file of the data set')
+    parser.add_argument('--config', dest='config', default=SCHEMA_CONFIG,
+                        help='config file whose cols, transform and time sections give the schema')
+    parser.add_argument('--seed', dest='seed', type=int, default=0, help='seed of the draws')
+    args = parser.parse_args()
+    generate(args.scale, schema(args.config), args.seed).to_csv(args.output, index=False)
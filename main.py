@@ -11,6 +11,7 @@ from sklearn.ensemble import AdaBoostClassifier
 from sklearn.naive_bayes import GaussianNB
 from sklearn.neighbors import KNeighborsClassifier
 from sklearn.svm import LinearSVC
+from sklearn.base import clone
 import yaml
 from collections import OrderedDict
 from itertools import product
@@ -18,9 +19,21 @@ import logging
 import sys
 import numpy as np
 import argparse
+import time
 import os
 from pipeline import model_factory
 from pipeline import evaluator
+from pipeline import executor
+from pipeline import shared_store
+from pipeline import result_store
+from pipeline import transform_cache
+from pipeline import loader
+from pipeline import temporal_splitter
+from pipeline import halving_search
+from pipeline import cost_model
+from pipeline import stage_timer
+from pipeline import plotter
+from pipeline import score_store
 import transformer
 import pandas as pd
 import gc
@@ -33,12 +46,15 @@ ch.setFormatter(formatter)
 logger.addHandler(ch)
 logger.setLevel(logging.INFO)
 
-def run(config):
+def run(args):
     '''
     run the pipeline and save the result to csv file as well as graphs
 
     Input:
-        config: yml file contains all the parameters of the pipeline
+        args: command line arguments, config is the yml file contains all
+              the parameters of the pipeline, workers is the number of
+              processes fitting the models of a split in parallel,
+              warm_start carries the fitted models over to the next split
     Return:
         save the results to the file
     '''
@@ -46,35 +62,364 @@ def run(config):
     config = args.config
     with open (config) as config_file:
         configs = yaml.safe_load(config_file)
-    df = pd.read_csv(configs['io']['input_path'])
     cols_config = configs['cols']
     time_config = configs['time']
     trans_configs = configs['transform']
     model_configs = configs['models']
     matrix_configs = configs['matrix']
+    timer = stage_timer.stage_timer(
+        matrix_configs.get('timing_path', matrix_configs['out_path'] + 'timing.jsonl'))
+    if args.recompute_metrics:
+        recompute_metrics(configs, args)
+        return
+    # Expand and check the grid before any data is loaded
+    grid_models = list(model_factory.get_models(model_configs))
+    split_infos = split_years(time_config)
+    logger.info('{} models on {} splits, {} fits'.format(
+        len(grid_models), len(split_infos), len(grid_models) * len(split_infos)))
+    with timer.stage('load'):
+        df = loader.load_dataset(configs['io'], cols_config, trans_configs)
+    if args.dry_run:
+        dry_run(df, grid_models, configs, args.workers, split_infos)
+        return
+    results = result_store.result_store(
+        matrix_configs.get('store_path', matrix_configs['out_path'] + 'results.jsonl'))
+    feature_configs = {'cols': cols_config, 'transform': trans_configs}
+    cache_configs = feature_configs
+    incremental = None
+    if args.warm_start:
+        # a warm fit continues on the same columns, the dummies of the first
+        # split are kept for the later ones
+        incremental = transformer.incremental_transformer(trans_configs, freeze_encoders=True)
+        cache_configs = dict(feature_configs, encoders='frozen')
+    elif trans_configs.get('incremental', [True])[0]:
+        incremental = transformer.incremental_transformer(trans_configs)
+    cache = None
+    if configs['io'].get('cache_dir'):
+        cache = transform_cache.transform_cache(configs['io']['cache_dir'],
+                                                configs['io']['input_path'], cache_configs)
+    # dimensions of the approximate nearest neighbor search, unset is exact
+    projection = configs.get('neighbors', {}).get('projection', [None])[0]
+    memory = memory_config(configs, args.workers)
+    # successive halving instead of the full grid when the models section
+    # has search options
+    search_configs = model_configs.get(model_factory.SEARCH_KEY)
+    col_list = list(matrix_configs['col_list'])
+    warm_dir = None
+    if args.warm_start:
+        # Warm fits are kept apart from the cold ones and flagged per row
+        warm_dir = matrix_configs.get('warm_start_dir', matrix_configs['out_path'] + 'warm_start/')
+        if not os.path.exists(warm_dir):
+            os.makedirs(warm_dir)
+        col_list.append('fit_mode')
+    col_list.extend(executor.STAT_COLUMNS)
+    # the results and the curves of the warm fits do not overwrite the cold ones
+    suffix = '_warm' if warm_dir else ''
+    plots = plotter.plotter(matrix_configs, suffix)
+    scores = None
+    if matrix_configs.get('save_scores', [True])[0]:
+        scores = score_store.score_store(
+            matrix_configs.get('score_dir', matrix_configs['out_path'] + 'scores/'))
+    timer.end_split(0)
     count = 1
-    for data in split(cols_config, time_config, df):
-        X_train, X_test, y_train, y_test = data
-        X_train, X_test = transformer.transform(trans_configs, X_train, X_test)
-        results_df = pd.DataFrame(columns=matrix_configs['col_list'])
-        for name, model in model_factory.get_models(model_configs):
-            logger.info('start to run the model {}'.format(model))
-            model.fit(X_train, y_train)
-            print(sys.getsizeof(model))
-            if name == 'LinearSVC':
-               y_pred_probs = model.decision_function(X_test)
-            else:
-               y_pred_probs = model.predict_proba(X_test)[:, 1]
-            index = len(results_df)
-            results_df.loc[index] = get_matrix(results_df, y_pred_probs, y_test, name, model, count,index, matrix_configs)
-            del model
-            gc.collect()
-        results_df.to_csv(matrix_configs['out_path'] + str(count) + ".csv")
+    splits = split(cols_config, time_config, df)
+    for split_info in split_infos:
+        with timer.stage('split'):
+            data = next(splits)
+        results_df = pd.DataFrame(columns=col_list)
+        key_info = dict(split_info, fit='warm') if warm_dir else split_info
+        grid = split_grid(grid_models, data[0].shape[0], memory, key_info, feature_configs)
+        store = None
+        try:
+            selected = range(len(grid))
+            if search_configs:
+                # Only the models the search selects are fitted on the whole split
+                with timer.stage('transform'):
+                    store = prepare_split(data, trans_configs, cache, split_info, incremental)
+                with timer.stage('search'):
+                    selected, history = halving_search.successive_halving(
+                        [entry[:2] for entry in grid], store, search_configs,
+                        matrix_configs['percentage'], args.workers, projection)
+                history.to_csv(matrix_configs['out_path'] + 'search_' + str(count) + suffix + '.csv')
+            # Reuse the rows finished by earlier runs
+            pending = []
+            for index in selected:
+                if grid[index][2] in results:
+                    record = results.get(grid[index][2])
+                    # rows stored before a column was added miss it
+                    results_df.loc[index] = record + [None] * (len(col_list) - len(record))
+                else:
+                    pending.append(index)
+            logger.info('{} of {} models of split {} are already done'.format(
+                len(selected) - len(pending), len(selected), count))
+            if pending:
+                y_test = data[3]
+                if store is None:
+                    with timer.stage('transform'):
+                        store = prepare_split(data, trans_configs, cache, split_info, incremental)
+                if scores is not None:
+                    scores.put_split(split_info, y_test, data[1].index.values, data[0].shape[0])
+                models = [grid[index][:2] for index in pending]
+                warm_paths = None
+                if warm_dir:
+                    # only the models able to continue a fit keep one
+                    warm_paths = [warm_path(warm_dir, configs['io'], feature_configs, name, model)
+                                  if name in model_factory.WARM_START_MODELS else None
+                                  for name, model in models]
+                fit_start = time.time()
+                evaluated = 0.0
+                for i, result in executor.run_models(models, store.handles, args.workers,
+                                                     warm_paths, projection, memory):
+                    index = pending[i]
+                    start = time.time()
+                    with timer.stage('metrics'):
+                        record = get_matrix(results_df, result['scores'], y_test, result['name'],
+                                            result['params'], count, index, matrix_configs)
+                    with timer.stage('plots'):
+                        plots.add(count, index, result['name'], result['params'],
+                                  y_test, result['scores'])
+                    if warm_dir:
+                        record.append(result['fit_mode'])
+                    record.extend(result['stats'][column] for column in executor.STAT_COLUMNS)
+                    if scores is not None:
+                        scores.put(grid[index][2], count, split_info, index, result['name'],
+                                   result['params'], result['scores'],
+                                   record[len(matrix_configs['col_list']):])
+                    results.append(grid[index][2], split_info, record)
+                    results_df.loc[index] = record
+                    gc.collect()
+                    evaluated += time.time() - start
+                # the fits run while the results are evaluated
+                timer.add('fit', time.time() - fit_start - evaluated)
+        finally:
+            if store is not None:
+                store.close()
+        with timer.stage('plots'):
+            plots.end_split(count)
+        results_df.sort_index().to_csv(matrix_configs['out_path'] + str(count) + suffix + ".csv")
+        timer.end_split(count)
         count += 1
+    # wait for the plots still rendering
+    with timer.stage('plots'):
+        plots.close()
+    timer.end_run()
+
+def memory_config(configs, workers):
+    '''
+    memory budget of a fit, the chunks of the scoring, the forests grown a
+    batch of trees at a time through disk and the models too large for the
+    budget
+
+    Input:
+        configs: the whole config
+        workers: number of worker processes of the run
+    Return:
+        dictionary of the memory section, budget_mb is the share of one fit
+    '''
+    memory = dict((key, values[0]) for key, values in configs.get('memory', {}).items())
+    if memory.get('budget_mb') and workers > 1:
+        # the fits running at once in the workers share the budget
+        memory['budget_mb'] = memory['budget_mb'] / float(workers)
+    return memory
+
+def split_grid(grid_models, n_rows, memory, key_info, feature_configs):
+    '''
+    the models fitted on one split, within the memory budget, and their keys
+
+    Input:
+        grid_models: list of (name, model) of the grid
+        n_rows: training rows of the split
+        memory: the memory section, see memory_config
+        key_info: boundaries of the split, with the fit mode of a warm run
+        feature_configs: columns and transform configs
+    Return:
+        list of (name, model, result_store.make_key of the fit)
+    '''
+    grid = []
+    for name, model in cost_model.fit_budget(grid_models, n_rows, memory):
+        model = clone(model)
+        grid.append((name, model, result_store.make_key(key_info, feature_configs, name, model)))
+    return grid
+
+def recompute_metrics(configs, args):
+    '''
+    rebuild the results and the curves of every split of the config from
+    the stored scores of the fits of its grid, without fitting any model
+
+    Input:
+        configs: the whole config, the matrix section may have changed
+                 since the scores were stored
+        args: command line arguments, warm_start recomputes the warm fits
+              and workers shares the memory budget as in the run
+    Return:
+        save the results to the file
+    '''
+    matrix_configs = configs['matrix']
+    feature_configs = {'cols': configs['cols'], 'transform': configs['transform']}
+    grid_models = list(model_factory.get_models(configs['models']))
+    memory = memory_config(configs, args.workers)
+    scores = score_store.score_store(
+        matrix_configs.get('score_dir', matrix_configs['out_path'] + 'scores/'))
+    results = result_store.result_store(
+        matrix_configs.get('store_path', matrix_configs['out_path'] + 'results.jsonl'))
+    suffix = '_warm' if args.warm_start else ''
+    plots = plotter.plotter(matrix_configs, suffix)
+    tail_columns = list(executor.STAT_COLUMNS)
+    if args.warm_start:
+        tail_columns.insert(0, 'fit_mode')
+    try:
+        for count, split_info in enumerate(split_years(configs['time']), 1):
+            stored = scores.get_split(split_info)
+            fits = scores.fits(split_info)
+            if stored is None or not fits:
+                logger.info('no stored scores for split {}'.format(count))
+                continue
+            y_test, _ = stored
+            # the grid of the run, downgraded on the training rows of the split
+            n_rows = scores.train_rows(split_info)
+            if n_rows is None:
+                # a store of an older run, from a fit of the same fit mode
+                tails = [fit['tail'] for fit in fits.values() if len(fit['tail']) == len(tail_columns)]
+                if not tails:
+                    logger.info('no stored {} fits of split {}'.format(
+                        'warm' if args.warm_start else 'cold', count))
+                    continue
+                n_rows = tails[0][tail_columns.index('train_rows')]
+            key_info = dict(split_info, fit='warm') if args.warm_start else split_info
+            grid = split_grid(grid_models, n_rows, memory, key_info, feature_configs)
+            results_df = pd.DataFrame(columns=list(matrix_configs['col_list']) + tail_columns)
+            rows = []
+            for index, (name, _, key) in enumerate(grid):
+                if key not in fits:
+                    continue
+                fit = fits[key]
+                y_pred_probs = scores.get(key)
+                record = get_matrix(results_df, y_pred_probs, y_test, name, fit['params'],
+                                    count, index, matrix_configs) + fit['tail']
+                plots.add(count, index, name, fit['params'], y_test, y_pred_probs)
+                rows.append((key, split_info, record))
+                results_df.loc[index] = record
+            results.upsert(rows)
+            plots.end_split(count)
+            results_df.sort_index().to_csv(matrix_configs['out_path'] + str(count) + suffix + ".csv")
+            logger.info('recomputed {} of {} results of split {}'.format(len(rows), len(grid), count))
+    finally:
+        plots.close()
+
+def dry_run(df, models, configs, workers, split_infos):
+    '''
+    print the projected time and memory of every fit of the run without
+    running it, the fits are calibrated on samples of the first split and
+    the grid of every split is kept within the memory budget as in the run
+
+    Input:
+        df: the loaded data
+        models: list of (name, model) of the grid
+        configs: the whole config
+        workers: number of worker processes of the run
+        split_infos: boundaries of every split, split_years
+    Return:
+        save the projection next to the results
+    '''
+    time_config = configs['time']
+    # a training window is every row up to its last year
+    years = df[configs['cols'].get('time_col', ['year'])[0]].values
+    train_rows = [int((years <= split_info['train_end']).sum()) for split_info in split_infos]
+    data = next(split(configs['cols'], time_config, df))
+    store = prepare_split(data, configs['transform'], None, None)
+    try:
+        costs, wall_clock = cost_model.dry_run(models, store.get('X_train'), store.get('y_train'),
+                                               store.get('X_test'), train_rows, workers,
+                                               memory_config(configs, workers))
+    finally:
+        store.close()
+    costs.to_csv(configs['matrix']['out_path'] + 'dry_run.csv')
+    print(costs.groupby(['model_name', 'parameters', 'models'], sort=False)[
+        ['seconds', 'peak_mb', 'model_mb']].max().to_string())
+    # a job fits every model of a group at once, a fit is a model on a split
+    print('{} fits in {} jobs of {} models on {} splits: {:.0f} seconds of fitting, '
+          'about {:.0f} seconds of wall clock on {} workers, transforms excluded'.format(
+              costs['models'].sum(), len(costs), len(models), len(train_rows),
+              costs['seconds'].sum(), wall_clock, workers))
+
+def warm_path(warm_dir, io_config, feature_configs, name, model):
+    '''
+    file keeping the fitted state of one model config between the splits
+
+    Input:
+        warm_dir: directory of the warm start files
+        io_config: the io section of the config
+        feature_configs: columns and transform configs
+        name: model's name
+        model: model obj
+    Return:
+        path of the file
+    '''
+    key = result_store.make_key({'input_path': io_config['input_path']}, feature_configs, name, model)
+    return os.path.join(warm_dir, key + '.pkl')
+
+def prepare_split(data, trans_configs, cache, split_info, incremental=None):
+    '''
+    transform one split and store its matrices for the model workers
+
+    Input:
+        data: X_train, X_test, y_train, y_test of the split
+        trans_configs: the transform section of the config
+        cache: transform_cache.transform_cache or None to always transform
+        split_info: boundaries of the split
+        incremental: transformer.incremental_transformer reused across the
+                     splits, None to transform every split from scratch
+    Return:
+        shared_store.matrix_store with X_train, X_test, y_train and the
+        names of the features when they are known
+    '''
+    if cache is not None:
+        store = cache.load(split_info)
+        if store is not None:
+            return store
+    X_train, X_test, y_train, y_test = data
+    if incremental is not None:
+        X_train, X_test = incremental.transform(X_train, X_test)
+    else:
+        # the split is a view of the sorted data, transform works on a copy
+        X_train, X_test = transformer.transform(trans_configs, X_train.copy(), X_test.copy())
+    # Workers attach to the memory mapped matrices instead of copies
+    if cache is not None:
+        store = cache.create(split_info)
+        order = 'F'
+    else:
+        store = shared_store.matrix_store()
+        order = 'C'
+    store.put('X_train', X_train, dtype=np.float64, order=order)
+    store.put('X_test', X_test, dtype=np.float64, order=order)
+    store.put('y_train', y_train)
+    # names of the features, a warm start only continues on the same ones
+    features = getattr(X_train, 'columns', None)
+    if features is None and incremental is not None:
+        features = incremental.feature_names
+    if features is not None:
+        store.put('features', np.asarray([str(feature) for feature in features]))
+    if cache is not None:
+        cache.commit(store, getattr(X_train, 'columns', []))
+    del X_train, X_test
+    gc.collect()
+    return store
+
+def split_years(time_config):
+    '''
+    boundaries of every train test split
+
+    Input:
+        time_config: start time, end time, time window
+    Return:
+        list of dictionaries with the last train year and the test years
+    '''
+    return temporal_splitter.temporal_splitter(time_config).split_info()
 
 def split(cols_config, time_config, df):
     '''
-    split the dataset based on the time
+    split the dataset based on the time, the rows are sorted by year once
+    and every train and test set is a range of the sorted rows
     
     Input: 
         cols_config: xs and y
@@ -84,17 +429,17 @@ def split(cols_config, time_config, df):
     return: 4 dataframes
     '''
     logger.info('starging to split the dataframe')
-    X = df[cols_config['x_cols']]
-    y = df[cols_config['y_col'][0]]
-    min_year = time_config['start_year']
-    max_year = time_config['end_year']
-    for year in range(min_year + 1, max_year - 3, 2):
-        X_train = X[X['year'] <= year]
-        X_test = X[(X['year'] == year + 3) | (X['year'] == year + 4)]
-        y_train = y[X['year'] <= year].ravel()
-        y_test = y[(X['year'] == year + 3) | (X['year'] == year + 4)].ravel()
+    time_column = cols_config.get('time_col', ['year'])[0]
+    splitter = temporal_splitter.temporal_splitter(time_config)
+    order = splitter.fit(df[time_column])
+    X = df[cols_config['x_cols']].iloc[order]
+    y = np.asarray(df[cols_config['y_col'][0]])[order]
+    for split_range in splitter.splits():
+        train_start, train_stop = split_range['train']
+        test_start, test_stop = split_range['test']
         logger.info('delivering data to pipeline')
-        yield X_train, X_test, y_train, y_test
+        yield (X.iloc[train_start:train_stop], X.iloc[test_start:test_stop],
+               y[train_start:train_stop], y[test_start:test_stop])
 
 
 def get_matrix(results_df, y_pred_probs, y_test, name, model, count, index, matrix_configs):
@@ -106,33 +451,36 @@ def get_matrix(results_df, y_pred_probs, y_test, name, model, count, index, matr
         y_pred_probs: get the score from the model
         y_test: true y
         name: model's name
-        model: model obj
+        model: model obj or its parameters as string
         count: number of train test set
     Return:
         one row of record for the result dataframe 
     '''
-    # Sort true y labels and predicted scores at the same time
-    y_pred_probs_sorted, y_test_sorted = zip(*sorted(zip(y_pred_probs, y_test), reverse=True))
-    # Write the evaluation results into data frame
+    # Sort the scores once and read every threshold from the same pass
     threshold = matrix_configs['percentage']
-    record = [name, str(model),
-              evaluator.precision_at_k(y_test_sorted, y_pred_probs_sorted, 100),
-              evaluator.compute_acc(y_test_sorted, y_pred_probs_sorted, threshold),
-              evaluator.compute_f1(y_test_sorted, y_pred_probs_sorted, threshold),
-              evaluator.compute_auc_roc(y_test_sorted, y_pred_probs_sorted, threshold)]
-
     threshold_list = [1, 2, 5, 10, 20, 30, 50]
-    for t in threshold_list:
-    	record.append(evaluator.precision_at_k(y_test_sorted, y_pred_probs_sorted, t))
-    	record.append(evaluator.recall_at_k(y_test_sorted, y_pred_probs_sorted, t))
-    graph_name_pr = matrix_configs['pr_path'] + r'''precision_recall_curve_{}_{}_{}'''.format(name,count,index)
-    evaluator.plot_precision_recall_n(y_test, y_pred_probs, str(model), graph_name_pr, 'save')
-    graph_name_roc = matrix_configs['roc_path'] + r'''roc_curve__{}_{}_{}'''.format(name,count,index)
-    evaluator.plot_roc(str(model), graph_name_roc, y_pred_probs, y_test, 'save')
+    metrics = evaluator.metrics_at_k(y_test, y_pred_probs, [100, threshold] + threshold_list)
+    # Write the evaluation results into data frame
+    record = [name, str(model),
+              metrics['precision'][0],
+              metrics['accuracy'][1],
+              metrics['f1'][1],
+              metrics['auc_roc'][1]]
+    for i in range(len(threshold_list)):
+        record.append(metrics['precision'][i + 2])
+        record.append(metrics['recall'][i + 2])
     return record
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Do a simple machine learning pipeline, load data, split the data, transform data, build models, run models, get the performace matix results')
     parser.add_argument('--config', dest='config', help='config file for this run', default ='./test_simple.yml')
+    parser.add_argument('--workers', dest='workers', type=int, default=1,
+                        help='number of processes fitting the models of a split in parallel')
+    parser.add_argument('--recompute-metrics', dest='recompute_metrics', action='store_true',
+                        help='rebuild the results and the curves of the splits and the grid of the config from the stored scores')
+    parser.add_argument('--dry-run', dest='dry_run', action='store_true',
+                        help='print the projected time and memory of the run without running it')
+    parser.add_argument('--warm-start', dest='warm_start', action='store_true',
+                        help='continue the fits of the previous split for the models supporting it')
     args = parser.parse_args()
     run(args)
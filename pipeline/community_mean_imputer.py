@@ -52,8 +52,14 @@ class community_mean_imputer():
     '''
 
     def __init__(self):
-        self.trained_imp = {}
-        self.filled_category = ""
+        self.trained_imp = pd.DataFrame()
+        self.global_mean = pd.Series(dtype=float)
+        self.filled_category = []
+        # running sums and counts for partial_fit
+        self.sums = None
+        self.counts = None
+        # the cells partial_fit filled with the global mean
+        self.global_filled = None
 
     def filled_categorical(self, train_df, test_df, categorical_columns):
         '''
@@ -83,48 +89,155 @@ class community_mean_imputer():
             time_column: column represents time unit
         Returns: the imputed trained dataframe
         '''
+        used_col_list = self.get_used_columns(df, loc_column, time_column)
 
-        used_col_list = list(df.columns)
-        for i in set([loc_column, time_column] + self.filled_category):
-            used_col_list.remove(i)
+        # one pass for the means of every (loc, year) and every column
+        groups = df.groupby([loc_column, time_column], observed=True)[used_col_list]
+        self.trained_imp = groups.mean()
+        self.global_mean = df[used_col_list].mean()
+        df[used_col_list] = df[used_col_list].fillna(groups.transform('mean'))
+        # a (loc, year) without any value takes the global mean
+        df[used_col_list] = df[used_col_list].fillna(self.global_mean)
 
-        for col in used_col_list:
-            print(col)
+        return df
 
-            for loc in list(df[loc_column].unique()):
-                for year in list(df[time_column].unique()):
-                    condition = (df[loc_column] == loc) & (df[time_column] == year)
-                    df.loc[(condition & df[col].isnull()), col] = df.loc[condition, col].mean()
+    def partial_fit(self, df, loc_column, time_column):
+        '''
+        Add new training rows to the running sums and counts of every
+        (loc, year), then impute the new rows. Rows of a (loc, year) seen in
+        an earlier call would change the means the earlier rows were
+        imputed with, check seen_groups first. The cells of a (loc, year)
+        without any value take the global mean, which later calls change,
+        refill_global brings the earlier rows up to date.
+        Inputs:
+            df: dataframe of the new training rows
+            loc_column: column represents the geographical unit
+            time_column: column represents time unit
+        Returns: the imputed new rows
+        '''
+        used_col_list = self.get_used_columns(df, loc_column, time_column)
+        groups = df.groupby([loc_column, time_column], observed=True)[used_col_list]
+        sums = groups.sum()
+        counts = groups.count()
+        if self.sums is None:
+            self.sums, self.counts = sums, counts
+            self.global_sums, self.global_counts = df[used_col_list].sum(), df[used_col_list].count()
+        else:
+            self.sums = self.sums.add(sums, fill_value=0)
+            self.counts = self.counts.add(counts, fill_value=0)
+            self.global_sums = self.global_sums.add(df[used_col_list].sum(), fill_value=0)
+            self.global_counts = self.global_counts.add(df[used_col_list].count(), fill_value=0)
+        self.trained_imp = self.sums / self.counts
+        self.global_mean = self.global_sums / self.global_counts
+
+        keys = pd.MultiIndex.from_arrays([df[loc_column], df[time_column]])
+        means = self.trained_imp[used_col_list].reindex(keys)
+        means.index = df.index
+        df[used_col_list] = df[used_col_list].fillna(means)
+        filled = df[used_col_list].isna()
+        self.global_filled = filled if self.global_filled is None else pd.concat([self.global_filled, filled])
+        df[used_col_list] = df[used_col_list].fillna(self.global_mean[used_col_list])
+        return df
 
-                    if (loc, year) not in self.trained_imp:
-                        self.trained_imp[(loc, year)] = {}
-                    self.trained_imp[(loc, year)][col] = df.loc[condition, col].mean()
+    def refill_global(self, df):
+        '''
+        Fill again the cells partial_fit filled with the global mean, with
+        the global mean of every row added so far
+        Inputs:
+            df: dataframe of the rows imputed by partial_fit, in order
+        Returns: the dataframe
+        '''
+        if self.global_filled is None:
+            return df
+        for col in self.global_filled.columns:
+            filled = self.global_filled[col].values
+            if filled.any():
+                df.loc[filled, col] = self.global_mean[col]
+        return df
 
-        #updated_missing_dict = summarize_missing_values(df)
-        #for column, values in updated_missing_dict.items():
-        #    if values[0] != 0:
-        #        df.loc[df[column].isnull(), column] = df[column].mean()
-        #        self.trained_imp[(loc, year)][col] = df.loc[column].mean()
+    def seen_groups(self, df, loc_column, time_column):
+        '''
+        Check whether some rows belong to a (loc, year) already fitted
+        Inputs:
+            df: dataframe
+            loc_column: column represents the geographical unit
+            time_column: column represents time unit
+        Returns: bool
+        '''
+        if self.counts is None or len(df) == 0:
+            return False
+        keys = pd.MultiIndex.from_arrays([df[loc_column], df[time_column]]).unique()
+        return self.counts.index.isin(keys).any()
 
-        return df
+    def get_used_columns(self, df, loc_column, time_column):
+        '''
+        Find the numeric columns to impute
+        Inputs:
+            df: dataframe
+            loc_column: column represents the geographical unit
+            time_column: column represents time unit
+        Returns: list of columns
+        '''
+        skipped = set([loc_column, time_column] + list(self.filled_category))
+        numeric = df.select_dtypes(include=[np.number]).columns
+        return [col for col in numeric if col not in skipped]
 
-    def transform_test(self, test_df, loc_column, time_column):
+    def transform_test(self, test_df, loc_column, time_column, lag=4, fallback='nearest'):
         '''
         This model is used to test the imputation model trained by the regional mean imputer
         Inputs:
             test_df: the testing dataframe
             loc_column: column represents the geographical unit
             time_column: column represents time unit
+            lag: a test row of year t uses the mean of year t - lag
+            fallback: what to use when (loc, t - lag) was never seen in training
+                'nearest': the nearest earlier year of the same loc, then the global mean
+                'global': the global mean of the training data
+                'none': leave the value missing
         Returns: imputed test dataframe
         '''
-        used_col_list = list(test_df.columns)
-        for i in set([loc_column, time_column] + self.filled_category):
-            used_col_list.remove(i)
-
-        for column in used_col_list:
-            for loc in list(test_df[loc_column].unique()):
-                for year in list(test_df[time_column].unique()):
-                    condition = ((test_df[column].isnull()) & (test_df[loc_column] == loc) & (
-                                test_df[time_column] == year))
-                    test_df.loc[condition, column] = self.trained_imp[(loc, year - 4)][column]
+        used_col_list = [col for col in self.get_used_columns(test_df, loc_column, time_column)
+                         if col in self.trained_imp.columns]
+        locs, first_year, table = self.build_lookup(used_col_list, fallback)
+
+        # integer codes of the loc and of the year in the lookup table
+        loc_codes = locs.get_indexer(test_df[loc_column])
+        year_codes = np.asarray(test_df[time_column], dtype=np.int64) - lag - first_year
+        if fallback == 'nearest':
+            year_codes = np.minimum(year_codes, table.shape[1] - 1)
+        found = (loc_codes >= 0) & (year_codes >= 0) & (year_codes < table.shape[1])
+
+        means = np.full((len(test_df), len(used_col_list)), np.nan)
+        means[found] = table[loc_codes[found], year_codes[found]]
+        means = pd.DataFrame(means, index=test_df.index, columns=used_col_list)
+        if fallback in ('nearest', 'global'):
+            means = means.fillna(self.global_mean[used_col_list])
+
+        test_df[used_col_list] = test_df[used_col_list].fillna(means)
         return test_df
+
+    def build_lookup(self, used_col_list, fallback):
+        '''
+        Lay the trained means out as a dense (loc, year, column) array
+        Inputs:
+            used_col_list: the columns to look up
+            fallback: with 'nearest' a missing year takes the means of the
+                      nearest earlier year of the same loc
+        Returns: index of the locs, first year, the array
+        '''
+        table = self.trained_imp[used_col_list]
+        loc_values = table.index.get_level_values(0)
+        year_values = np.asarray(table.index.get_level_values(1), dtype=np.int64)
+        locs = pd.Index(loc_values.unique())
+        first_year = year_values.min()
+        n_years = year_values.max() - first_year + 1
+
+        dense = np.full((len(locs), n_years, len(used_col_list)), np.nan)
+        dense[locs.get_indexer(loc_values), year_values - first_year] = table.values
+        if fallback == 'nearest':
+            # carry the last year with a mean forward, per loc and column
+            year_pos = np.arange(n_years)[np.newaxis, :, np.newaxis]
+            last_seen = np.where(np.isnan(dense), 0, year_pos)
+            np.maximum.accumulate(last_seen, axis=1, out=last_seen)
+            dense = np.take_along_axis(dense, last_seen, axis=1)
+        return locs, first_year, dense
@@ -0,0 +1,248 @@
+'''
+Cost model of the fits of a grid run: calibration fits on row samples
+project the time and memory of every fit and the wall clock time of the
+run, and the projected size of the tree models keeps a run within its
+memory budget
+'''
+from sklearn.base import clone
+import numpy as np
+import pandas as pd
+import heapq
+import logging
+import math
+import sys
+import time
+import tracemalloc
+from pipeline import executor
+from pipeline import model_factory
+
+logger = logging.getLogger('cost model')
+ch = logging.StreamHandler(sys.stdout)
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+logger.setLevel(logging.INFO)
+
+# training rows of the two calibration fits
+CALIBRATION_ROWS = (500, 1000)
+# ensembles are calibrated with at most this many estimators
+CALIBRATION_ESTIMATORS = 10
+# bounds of the growth of the fit time with the training rows
+MIN_EXPONENT, MAX_EXPONENT = 1.0, 2.0
+# bytes of a node of a fitted tree, the node and its values of two classes
+NODE_BYTES = 80
+# models made of trees, with the depth of their trees when it is not set
+TREE_MODELS = {'DecisionTreeClassifier': None, 'RandomForestClassifier': None,
+               'ExtraTreesClassifier': None, 'BaggingClassifier': None,
+               'GradientBoostingClassifier': 3, 'AdaBoostClassifier': 1}
+# what to do with a model projected over the memory budget
+OVERSIZE_POLICIES = ('downgrade', 'skip', 'run')
+
+
+def makespan(costs, workers):
+    '''
+    Wall clock time of running jobs longest first on a pool of workers
+    Inputs:
+        costs: time of every job
+        workers: number of workers
+    Returns: time until the last job finishes
+    '''
+    finish = [0.0] * max(workers, 1)
+    for cost in sorted(costs, reverse=True):
+        heapq.heappush(finish, heapq.heappop(finish) + cost)
+    return max(finish)
+
+
+def _shrink(members):
+    '''
+    copies of the models of a job with at most CALIBRATION_ESTIMATORS
+    estimators, and the factor the fit time grows by at the full size
+    '''
+    shrunk = []
+    scale = 1.0
+    for index, model in members:
+        model = clone(model)
+        n_estimators = model.get_params().get('n_estimators')
+        if n_estimators and n_estimators > CALIBRATION_ESTIMATORS:
+            scale = max(scale, n_estimators / float(CALIBRATION_ESTIMATORS))
+            model.set_params(n_estimators=CALIBRATION_ESTIMATORS)
+        shrunk.append((index, model))
+    return shrunk, scale
+
+
+def calibrate(job, X_train, y_train, X_test, random_state):
+    '''
+    Fit a job on two samples of the training rows
+    Inputs:
+        job: (kind, name, members) of model_factory.plan_jobs
+        X_train, y_train: training data of a split
+        X_test: test features of the split
+        random_state: numpy RandomState of the samples
+    Returns: dictionary of the sample rows, fit seconds and peak bytes of
+             the larger sample, and the scale of the estimators
+    '''
+    kind, name, members = job
+    rows, seconds = [], []
+    for n_rows in CALIBRATION_ROWS:
+        n_rows = min(n_rows, X_train.shape[0])
+        sample = np.sort(random_state.choice(X_train.shape[0], n_rows, replace=False))
+        n_test = max(int(n_rows * X_test.shape[0] / float(X_train.shape[0])), 1)
+        test_sample = np.sort(random_state.choice(X_test.shape[0], min(n_test, X_test.shape[0]),
+                                                  replace=False))
+        data = (X_train[sample], y_train[sample], X_test[test_sample])
+        shrunk, _ = _shrink(members)
+        start = time.time()
+        executor.run_job(kind, name, shrunk, *data)
+        seconds.append(time.time() - start)
+        rows.append(n_rows)
+    shrunk, scale = _shrink(members)
+    tracemalloc.start()
+    executor.run_job(kind, name, shrunk, *data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'rows': rows, 'seconds': seconds, 'peak': peak, 'scale': scale}
+
+
+def project(calibration, n_rows):
+    '''
+    Time and peak memory of the full fit of a calibrated job
+    Inputs:
+        calibration: result of calibrate
+        n_rows: training rows of the full fit
+    Returns: seconds, bytes
+    '''
+    (n1, n2), (t1, t2) = calibration['rows'], calibration['seconds']
+    exponent = MIN_EXPONENT
+    if n2 > n1 and t1 > 0 and t2 > 0:
+        exponent = min(max(math.log(t2 / t1) / math.log(float(n2) / n1), MIN_EXPONENT), MAX_EXPONENT)
+    growth = float(n_rows) / n2
+    seconds = t2 * growth ** exponent * calibration['scale']
+    peak = calibration['peak'] * growth * calibration['scale']
+    return seconds, peak
+
+
+def dry_run(models, X_train, y_train, X_test, train_rows, workers=1, memory=None, random_state=0):
+    '''
+    Project the time and memory of every fit of a grid run
+    Inputs:
+        models: list of (name, model) of the grid
+        X_train, y_train, X_test: transformed data of one split
+        train_rows: number of training rows of every split
+        workers: number of worker processes of the run
+        memory: dictionary of the memory section of the config, the grid
+                of every split is kept within its budget as by fit_budget
+        random_state: seed of the calibration samples
+    Returns: dataframe with a row per job and split, with the parameters
+             of its first model, its number of models and the model_size
+             of its largest, and the projected wall clock time of the fits
+             in seconds
+    '''
+    random_state = np.random.RandomState(random_state)
+    y_train = np.asarray(y_train)
+    logger.info('calibrating the fits of {} models'.format(len(models)))
+    rows = []
+    wall_clock = 0.0
+    # a job downgraded on a split only is calibrated again
+    calibrations = {}
+    for split, n_rows in enumerate(train_rows, 1):
+        for job in model_factory.plan_jobs(fit_budget(models, n_rows, memory)):
+            key = (job[0], job[1], tuple(str(model) for _, model in job[2]))
+            if key not in calibrations:
+                calibrations[key] = calibrate(job, X_train, y_train, X_test, random_state)
+            seconds, peak = project(calibrations[key], n_rows)
+            size = max(model_size(job[1], model, n_rows) for _, model in job[2])
+            rows.append([split, job[1], str(job[2][0][1]), len(job[2]), n_rows, seconds,
+                         peak / 2.0 ** 20, size / 2.0 ** 20])
+    costs = pd.DataFrame(rows, columns=['split', 'model_name', 'parameters', 'models',
+                                        'train_rows', 'seconds', 'peak_mb', 'model_mb'])
+    for split, split_costs in costs.groupby('split'):
+        wall_clock += makespan(split_costs['seconds'].tolist(), workers)
+    return costs, wall_clock
+
+
+def model_size(name, model, n_rows):
+    '''
+    Upper bound of the size of a fitted tree model. A tree of n rows has
+    at most n / min_samples_leaf leaves, a split leaves a node of at least
+    min_samples_split rows one row smaller at worst, so at most
+    n - min_samples_split + 2 leaves, and a tree of depth d at most 2^d
+    leaves, a tree of L leaves has 2L - 1 nodes
+    Inputs:
+        name: model's name
+        model: model obj
+        n_rows: training rows
+    Returns: bytes, 0 for the models not made of trees
+    '''
+    if name not in TREE_MODELS:
+        return 0
+    params = model.get_params()
+    depth = _tree_param(params, 'max_depth', TREE_MODELS[name])
+    min_samples_leaf = _tree_param(params, 'min_samples_leaf', 1)
+    min_samples_split = _tree_param(params, 'min_samples_split', 2)
+    # fractions are of the training rows
+    if isinstance(min_samples_leaf, float):
+        min_samples_leaf = math.ceil(min_samples_leaf * n_rows)
+    if isinstance(min_samples_split, float):
+        min_samples_split = math.ceil(min_samples_split * n_rows)
+    leaves = min(n_rows // max(min_samples_leaf, 1), n_rows - min_samples_split + 2)
+    max_leaf_nodes = _tree_param(params, 'max_leaf_nodes', None)
+    if max_leaf_nodes is not None:
+        leaves = min(leaves, max_leaf_nodes)
+    if depth is not None:
+        leaves = min(leaves, 2 ** depth)
+    nodes = 2 * max(leaves, 1) - 1
+    return params.get('n_estimators', 1) * nodes * NODE_BYTES
+
+
+def _tree_param(params, key, default):
+    '''
+    Parameter of the trees of a model, set on the model or on its
+    estimator for the meta ensembles
+    '''
+    return params.get(key, params.get('estimator__' + key, default))
+
+
+def fit_budget(models, n_rows, memory):
+    '''
+    Keep the models of a split within the memory budget, a model whose
+    model_size is over budget_mb is run with the number of estimators
+    which fits, or skipped, as the oversize option of the memory section
+    says. budget_mb is the budget of one fit, main divides the budget of
+    the config among the workers fitting at once.
+    Inputs:
+        models: list of (name, model) of the grid
+        n_rows: training rows of the split
+        memory: dictionary of the memory section of the config, oversize
+                is one of OVERSIZE_POLICIES (default 'downgrade'), None or
+                no budget_mb keeps every model
+    Returns: list of (name, model), a downgraded model is a new obj and a
+             downgrade already in the grid is dropped
+    '''
+    if not memory or not memory.get('budget_mb'):
+        return list(models)
+    policy = memory.get('oversize', 'downgrade')
+    if policy not in OVERSIZE_POLICIES:
+        raise ValueError('oversize must be one of {}, got {}'.format(OVERSIZE_POLICIES, policy))
+    budget = memory['budget_mb'] * 2 ** 20
+    kept = []
+    seen = set()
+    for name, model in models:
+        size = model_size(name, model, n_rows)
+        if size > budget and policy != 'run':
+            n_estimators = model.get_params().get('n_estimators')
+            fitting = 0
+            if policy == 'downgrade' and n_estimators:
+                fitting = int(n_estimators * budget // size)
+            if fitting < 1:
+                logger.warning('skipping {}, {:.1f} MB projected over the budget of {} MB'.format(
+                    model, size / 2.0 ** 20, memory['budget_mb']))
+                continue
+            logger.warning('{:.1f} MB projected for {}, over the budget of {} MB, fitting {} '
+                           'estimators'.format(size / 2.0 ** 20, model, memory['budget_mb'], fitting))
+            model = clone(model).set_params(n_estimators=fitting)
+        key = (name, tuple(model_factory.canonical_params(model)))
+        if key in seen:
+            continue
+        seen.add(key)
+        kept.append((name, model))
+    return kept
@@ -1,13 +1,9 @@
 import numpy as np
-from sklearn.metrics import accuracy_score
-from sklearn.metrics import precision_score
-from sklearn.metrics import recall_score
-from sklearn.metrics import f1_score
 from sklearn.metrics import roc_curve
-from sklearn.metrics import roc_auc_score
 from sklearn.metrics import auc
 from sklearn.metrics import precision_recall_curve
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 
 def compute_acc(y_true, y_scores, k):
     '''
@@ -18,10 +14,7 @@ def compute_acc(y_true, y_scores, k):
 
     :return: (float) an accuracy score
     '''
-    y_scores_sorted, y_true_sorted = joint_sort_descending(np.array(y_scores), np.array(y_true))
-    preds_at_k = generate_binary_at_k(y_scores_sorted, k)
-
-    return accuracy_score(y_true_sorted, preds_at_k)
+    return metrics_at_k(y_true, y_scores, [k])['accuracy'][0]
 
 
 def compute_f1(y_true, y_scores, k):
@@ -33,10 +26,7 @@ def compute_f1(y_true, y_scores, k):
 
     :return: (float) an f1 score
     '''
-    y_scores_sorted, y_true_sorted = joint_sort_descending(np.array(y_scores), np.array(y_true))
-    preds_at_k = generate_binary_at_k(y_scores_sorted, k)
-
-    return f1_score(y_true_sorted, preds_at_k)
+    return metrics_at_k(y_true, y_scores, [k])['f1'][0]
 
 def compute_auc_roc(y_true, y_scores, k):
     '''
@@ -47,10 +37,7 @@ def compute_auc_roc(y_true, y_scores, k):
 
     :return: (float) an auc_roc score
     '''
-    y_scores_sorted, y_true_sorted = joint_sort_descending(np.array(y_scores), np.array(y_true))
-    preds_at_k = generate_binary_at_k(y_scores_sorted, k)
-
-    return roc_auc_score(y_true_sorted, preds_at_k)
+    return metrics_at_k(y_true, y_scores, [k])['auc_roc'][0]
 
 
 def compute_auc(pred_scores, true_labels):
@@ -102,9 +89,7 @@ def precision_at_k(y_true, y_scores, k):
 
     :return: (float) precision score
     '''
-    y_scores_sorted, y_true_sorted = joint_sort_descending(np.array(y_scores), np.array(y_true))
-    preds_at_k = generate_binary_at_k(y_scores_sorted, k)
-    return precision_score(y_true_sorted, preds_at_k)
+    return metrics_at_k(y_true, y_scores, [k])['precision'][0]
 
 
 def recall_at_k(y_true, y_scores, k):
@@ -116,27 +101,116 @@ def recall_at_k(y_true, y_scores, k):
 
     :return: (float) recall score
     '''
-    y_scores_sorted, y_true_sorted = joint_sort_descending(np.array(y_scores), np.array(y_true))
-    preds_at_k = generate_binary_at_k(y_scores_sorted, k)
-    return recall_score(y_true_sorted, preds_at_k)
+    return metrics_at_k(y_true, y_scores, [k])['recall'][0]
+
+
+def metrics_at_k(y_true, y_scores, thresholds):
+    '''
+    Compute precision, recall, accuracy, f1 and auc_roc at every threshold
+    (percentage) with a single sort of the scores. The top k percent of the
+    population is labeled 1, and the confusion matrix at each cutoff is read
+    from the cumulative sum of positives along the sorted labels.
+    :param y_true: the true labels
+    :param y_scores: the predicted scores
+    :param thresholds: list of (int or float) thresholds
+
+    :return: dictionary of numpy arrays aligned with thresholds, keyed by
+             'precision', 'recall', 'accuracy', 'f1' and 'auc_roc'
+    '''
+    y_true = np.asarray(y_true).ravel()
+    y_scores = np.asarray(y_scores).ravel()
+    n = len(y_scores)
+    # stable sort keeps ties in their original order
+    order = np.argsort(-y_scores, kind='mergesort')
+    cum_pos = np.concatenate(([0], np.cumsum(y_true[order] == 1)))
+    total_pos = cum_pos[-1]
+    total_neg = n - total_pos
+
+    cutoffs = (n * (np.asarray(thresholds, dtype=float) / 100.0)).astype(int)
+    cutoffs = np.clip(cutoffs, 0, n)
+    tp = cum_pos[cutoffs].astype(float)
+    fp = cutoffs - tp
+    fn = total_pos - tp
+    tn = total_neg - fp
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(cutoffs > 0, tp / cutoffs, 0.0)
+        recall = np.where(total_pos > 0, tp / total_pos, 0.0)
+        accuracy = (tp + tn) / n if n else np.zeros(len(cutoffs))
+        f1_denom = 2 * tp + fp + fn
+        f1 = np.where(f1_denom > 0, 2 * tp / f1_denom, 0.0)
+        # area under the two-segment roc curve of the binary predictions
+        if total_pos > 0 and total_neg > 0:
+            auc_roc = (1 + recall - fp / total_neg) / 2
+        else:
+            auc_roc = np.full(len(cutoffs), np.nan)
+
+    return {'precision': precision, 'recall': recall, 'accuracy': accuracy,
+            'f1': f1, 'auc_roc': auc_roc}
+
+
+def new_figure(output_type):
+    '''
+    Figure to draw on, saved figures do not touch the global pyplot state
+    so they can be drawn from any process without a display
+    '''
+    if output_type == 'save':
+        figure = Figure()
+        FigureCanvasAgg(figure)
+        return figure
+    import matplotlib.pyplot as plt
+    return plt.figure()
+
+
+def output_figure(figure, save_name, output_type):
+    '''
+    Save or show a figure of new_figure
+    '''
+    if output_type == 'save':
+        figure.savefig(save_name)
+    else:
+        import matplotlib.pyplot as plt
+        plt.show()
+        plt.close(figure)
+
+
+def precision_recall_n_curve(y_true, y_score):
+    '''
+    Precision and recall of the rows scored at or above every distinct
+    score and the share of the population above it, from one sort of the
+    scores, so the curve can be kept and plotted without the scores
+    Returns: precision, recall, percent of population arrays by increasing
+             threshold, as precision_recall_curve without its last point
+    '''
+    y_true = np.asarray(y_true)
+    y_score = np.asarray(y_score)
+    order = np.argsort(-y_score, kind='mergesort')
+    sorted_score = y_score[order]
+    true_positives = np.cumsum(y_true[order] == 1)
+    # last row of every run of equal scores, every row above it is selected
+    last = np.r_[np.flatnonzero(np.diff(sorted_score)), len(sorted_score) - 1]
+    number_above = last + 1
+    true_positives = true_positives[last]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision_curve = true_positives / number_above.astype(float)
+        recall_curve = true_positives / float(true_positives[-1])
+    pct_above_per_thresh = number_above / float(len(y_score))
+    return precision_curve[::-1], recall_curve[::-1], pct_above_per_thresh[::-1]
 
 
 def plot_precision_recall_n(y_true, y_prob, name, save_name, output_type):
-    #pdb.set_trace()    
-    y_score = y_prob
-    precision_curve, recall_curve, pr_thresholds = precision_recall_curve(y_true, y_score)
-    precision_curve = precision_curve[:-1]
-    recall_curve = recall_curve[:-1]
-    pct_above_per_thresh = []
-    number_scored = len(y_score)
-    for value in pr_thresholds:
-        num_above_thresh = len(y_score[y_score >= value])
-        pct_above_thresh = num_above_thresh / float(number_scored)
-        pct_above_per_thresh.append(pct_above_thresh)
-    pct_above_per_thresh = np.array(pct_above_per_thresh)
-
-    plt.clf()
-    fig, ax1 = plt.subplots()
+    precision_curve, recall_curve, pct_above_per_thresh = precision_recall_n_curve(y_true, y_prob)
+    plot_precision_recall_n_curve(precision_curve, recall_curve, pct_above_per_thresh,
+                                  name, save_name, output_type)
+
+
+def plot_precision_recall_n_curve(precision_curve, recall_curve, pct_above_per_thresh,
+                                  name, save_name, output_type):
+    '''
+    Plot a curve of precision_recall_n_curve
+    '''
+    figure = new_figure(output_type)
+    ax1 = figure.add_subplot(111)
     ax1.plot(pct_above_per_thresh, precision_curve, 'b')
     ax1.set_xlabel('percent of population')
     ax1.set_ylabel('precision', color='b')
@@ -147,34 +221,58 @@ def plot_precision_recall_n(y_true, y_prob, name, save_name, output_type):
     ax1.set_ylim([0, 1])
     ax2.set_xlim([0, 1])
 
-    plt.title(name)
-    if (output_type == 'save'):
-        plt.savefig(save_name)
-        plt.close()
-    elif (output_type == 'show'):
-        plt.show()
-    else:
-        plt.show()
+    ax1.set_title(name)
+    output_figure(figure, save_name, output_type)
 
 
 def plot_roc(name, save_name, probs, y_true, output_type):
     
     fpr, tpr, thresholds = roc_curve(y_true, probs)
     roc_auc = auc(fpr, tpr)
-    plt.clf()
-    plt.plot(fpr, tpr, label='ROC curve (area = %0.2f)' % roc_auc)
-    plt.plot([0, 1], [0, 1], 'k--')
-    plt.xlim([0.0, 1.05])
-    plt.ylim([0.0, 1.05])
-    plt.xlabel('False Positive Rate')
-    plt.ylabel('True Positive Rate')
-    plt.title(name)
-    plt.legend(loc="lower right")
-    if (output_type == 'save'):
-        plt.savefig(save_name, close=True)
-        plt.close()
-    elif (output_type == 'show'):
-        plt.show()
-    else:
-        plt.show()
-
+    figure = new_figure(output_type)
+    ax = figure.add_subplot(111)
+    ax.plot(fpr, tpr, label='ROC curve (area = %0.2f)' % roc_auc)
+    ax.plot([0, 1], [0, 1], 'k--')
+    ax.set_xlim([0.0, 1.05])
+    ax.set_ylim([0.0, 1.05])
+    ax.set_xlabel('False Positive Rate')
+    ax.set_ylabel('True Positive Rate')
+    ax.set_title(name)
+    ax.legend(loc="lower right")
+    output_figure(figure, save_name, output_type)
+
+
+def plot_combined(curves, title, pr_name, roc_name, output_type):
+    '''
+    Draw the precision recall and the roc curves of several models on one
+    precision figure and one roc figure
+    Inputs:
+        curves: list of (label, y_true, y_score)
+        title: title of the figures
+        pr_name, roc_name: where to save the figures
+        output_type: 'save' or 'show'
+    '''
+    pr_figure = new_figure(output_type)
+    pr_ax = pr_figure.add_subplot(111)
+    roc_figure = new_figure(output_type)
+    roc_ax = roc_figure.add_subplot(111)
+    for label, y_true, y_score in curves:
+        precision_curve, _, pct_above_per_thresh = precision_recall_n_curve(y_true, y_score)
+        pr_ax.plot(pct_above_per_thresh, precision_curve, label=label)
+        fpr, tpr, _ = roc_curve(y_true, y_score)
+        roc_ax.plot(fpr, tpr, label='%s (area = %0.2f)' % (label, auc(fpr, tpr)))
+    pr_ax.set_xlabel('percent of population')
+    pr_ax.set_ylabel('precision')
+    pr_ax.set_xlim([0, 1])
+    pr_ax.set_ylim([0, 1])
+    pr_ax.set_title(title)
+    pr_ax.legend(loc='upper right', fontsize='x-small')
+    roc_ax.plot([0, 1], [0, 1], 'k--')
+    roc_ax.set_xlim([0.0, 1.05])
+    roc_ax.set_ylim([0.0, 1.05])
+    roc_ax.set_xlabel('False Positive Rate')
+    roc_ax.set_ylabel('True Positive Rate')
+    roc_ax.set_title(title)
+    roc_ax.legend(loc='lower right', fontsize='x-small')
+    output_figure(pr_figure, pr_name, output_type)
+    output_figure(roc_figure, roc_name, output_type)
@@ -0,0 +1,686 @@
+'''
+Run the models of the grid on one train/test split, either one by one
+or in a pool of worker processes
+'''
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import as_completed
+from scipy import sparse
+from sklearn import config_context
+from sklearn.base import clone
+from sklearn.random_projection import SparseRandomProjection
+import numpy as np
+import copy
+import joblib
+import logging
+import pickle
+import shutil
+import sys
+import tempfile
+import time
+import os
+try:
+    import resource
+except ImportError:
+    resource = None
+from pipeline import model_factory
+from pipeline import shared_store
+
+logger = logging.getLogger('executor')
+ch = logging.StreamHandler(sys.stdout)
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+logger.setLevel(logging.INFO)
+
+# models which do not accept scipy sparse input
+DENSE_ONLY = ('GaussianNB',)
+
+# ensembles scored stage by stage, the others by their first estimators
+STAGED_MODELS = ('GradientBoostingClassifier', 'AdaBoostClassifier')
+
+# forests which can be grown and scored a batch of trees at a time
+SPILL_MODELS = ('RandomForestClassifier', 'ExtraTreesClassifier')
+
+# bytes per test row held by the scoring besides the features: the scores
+# of the estimators in flight and their sum, two classes of float64
+SCORE_ROW_BYTES = 16
+
+# measures of every fit, in the order of the result columns
+STAT_COLUMNS = ['fit_seconds', 'predict_seconds', 'peak_rss_delta_mb', 'model_bytes',
+                'train_rows', 'test_rows', 'features']
+
+# data of the current split, set once in every worker process
+_split_data = {}
+
+
+def _init_worker(handles):
+    '''
+    Attach the worker to the memory mapped data of the split, only the
+    file names travel to the worker
+    '''
+    _split_data.clear()
+    _split_data.update(shared_store.attach_all(handles))
+
+
+def fit_and_predict(name, model, X_train, y_train, X_test, warm_path=None, memory=None,
+                    features=None):
+    '''
+    Fit one model and score the test set
+
+    Input:
+        name: model's name
+        model: model obj
+        X_train, y_train: training data, numpy or scipy sparse matrix
+        X_test: test features
+        warm_path: file keeping the fitted state of this configuration
+                   between splits, None fits from scratch
+        memory: dictionary of the memory section of the config, see
+                chunk_rows and spills, None scores at once in memory
+        features: names of the columns of X_train, a warm start needs the
+                  same names as the fit it continues
+    Return:
+        dictionary with the name, the parameters of the model as string,
+        the predicted scores, the fit mode, 'warm' when the fit continued
+        from the previous split, and the stats of fit_stats
+    '''
+    params = str(model)
+    fit_mode = 'cold'
+    if warm_path is not None:
+        n_old, previous, old_features = load_warm_state(warm_path)
+        if previous is not None and not same_features(old_features, features):
+            logger.info('the features of {} changed, fitting from scratch'.format(params))
+            previous = None
+        model, reused = model_factory.warm_start_from(name, model, previous, n_old, X_train.shape[0])
+        if reused:
+            fit_mode = 'warm'
+    rss = reset_peak_rss()
+    if name in DENSE_ONLY and sparse.issparse(X_train):
+        X_train = X_train.toarray()
+        X_test = X_test.toarray()
+    if spills(name, model, memory, warm_path):
+        n_estimators = model.get_params()['n_estimators']
+        # the batches grow with warm_start, which is not left on the model
+        model = clone(model)
+        start = time.time()
+        batches = fit_spilled(model, X_train, y_train, memory)
+        fit_seconds = time.time() - start
+        try:
+            start = time.time()
+            y_pred_probs = spilled_scores(batches, X_test, [n_estimators],
+                                          chunk_rows(model, X_test, memory))[n_estimators]
+            predict_seconds = time.time() - start
+        finally:
+            shutil.rmtree(os.path.dirname(batches[0][0]))
+        size = model_bytes(model) + sum(sum(sizes) for _, sizes in batches)
+        stats = fit_stats(X_train, X_test, fit_seconds, predict_seconds, rss, size)
+        return {'name': name, 'params': params, 'scores': y_pred_probs, 'fit_mode': fit_mode,
+                'stats': stats}
+    start = time.time()
+    model.fit(X_train, y_train)
+    fit_seconds = time.time() - start
+    if warm_path is not None:
+        save_warm_state(warm_path, X_train.shape[0], model, features)
+    start = time.time()
+    y_pred_probs = predict_scores(name, model, X_test, chunk_rows(model, X_test, memory))
+    stats = fit_stats(X_train, X_test, fit_seconds, time.time() - start, rss, model)
+    return {'name': name, 'params': params, 'scores': y_pred_probs, 'fit_mode': fit_mode,
+            'stats': stats}
+
+
+def reset_peak_rss():
+    '''
+    Start the memory measure of a fit, the peak resident memory of the
+    process is reset to its current value where Linux allows it, so that
+    the peak read after the fit is its own and not the one of an earlier
+    fit of the same process
+    Return:
+        the peak_rss_mb the fit starts from
+    '''
+    try:
+        with open('/proc/self/clear_refs', 'w') as refs:
+            refs.write('5')
+    except (IOError, OSError):
+        pass
+    return peak_rss_mb()
+
+
+def peak_rss_mb():
+    '''
+    Peak resident memory of this process in MB since the last
+    reset_peak_rss, or since the process started where the peak cannot be
+    reset, nan where the platform does not report it
+    '''
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                # ru_maxrss also keeps the peak of the parent process and
+                # ignores the reset
+                if line.startswith('VmHWM:'):
+                    return float(line.split()[1]) / 1024.0
+    except (IOError, OSError):
+        pass
+    if resource is None:
+        return float('nan')
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2.0 ** 20 if sys.platform == 'darwin' else peak / 1024.0
+
+
+class _byte_counter():
+
+    '''
+    File-like object counting the bytes written to it
+    '''
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += memoryview(data).nbytes
+
+
+def model_bytes(model):
+    '''
+    Size of the pickled model, counted without keeping the bytes
+    '''
+    counter = _byte_counter()
+    pickle.dump(model, counter, protocol=pickle.HIGHEST_PROTOCOL)
+    return counter.size
+
+
+def fit_stats(X_train, X_test, fit_seconds, predict_seconds, rss_before, model):
+    '''
+    Measures of one fit, see STAT_COLUMNS
+    Input:
+        X_train, X_test: the features of the fit
+        fit_seconds, predict_seconds: time of the fit and of the scoring
+        rss_before: reset_peak_rss at the start of the fit
+        model: the fitted model obj, or its model_bytes when already known
+    Return:
+        dictionary of the measures, the peak RSS delta is how far the
+        resident memory rose above its level at the start of the fit, on
+        Linux; elsewhere how much the fit raised the peak of the process,
+        0 when an earlier fit went higher
+    '''
+    return {'fit_seconds': fit_seconds, 'predict_seconds': predict_seconds,
+            'peak_rss_delta_mb': peak_rss_mb() - rss_before,
+            'model_bytes': model if isinstance(model, int) else model_bytes(model),
+            'train_rows': X_train.shape[0], 'test_rows': X_test.shape[0],
+            'features': X_train.shape[1]}
+
+
+def predict_scores(name, model, X_test, chunk=None):
+    '''
+    Score the test set with a fitted model
+    Input:
+        name: model's name
+        model: fitted model obj
+        X_test: test features
+        chunk: number of rows scored at once, None scores them all at once
+    Return:
+        the scores of the positive class
+    '''
+    if chunk is not None and chunk < X_test.shape[0]:
+        # the rows are scored independently, the chunks give the same scores
+        return np.concatenate([predict_scores(name, model, X_test[start:start + chunk])
+                               for start in range(0, X_test.shape[0], chunk)])
+    if name == 'LinearSVC':
+        return model.decision_function(X_test)
+    return model.predict_proba(X_test)[:, 1]
+
+
+def chunk_rows(model, X_test, memory):
+    '''
+    Number of test rows whose scoring fits the memory budget: a dense
+    copy of their features and the scores of the estimators running at
+    once, on as many threads as the model uses
+    Input:
+        model: fitted model obj
+        X_test: test features
+        memory: dictionary of the memory section of the config, budget_mb
+                is the budget, None or no budget scores at once
+    Return:
+        the number of rows, None for all of them
+    '''
+    if not memory or not memory.get('budget_mb'):
+        return None
+    n_jobs = model.get_params().get('n_jobs') or 1
+    threads = (os.cpu_count() or 1) if n_jobs < 0 else n_jobs
+    row_bytes = X_test.shape[1] * 8 + SCORE_ROW_BYTES * (threads + 1)
+    return max(int(memory['budget_mb'] * 2 ** 20 // row_bytes), 1)
+
+
+def spills(name, model, memory, warm_path=None):
+    '''
+    Whether a forest is grown and scored a batch of trees at a time: the
+    memory section has a spill_dir and the forest more than spill_trees
+    trees (default 50). A forest with an out-of-bag score, which needs
+    every tree at once, or kept for a warm start is grown in memory.
+    '''
+    if not memory or not memory.get('spill_dir') or name not in SPILL_MODELS:
+        return False
+    params = model.get_params()
+    return (warm_path is None and not params['oob_score']
+            and params['n_estimators'] > memory.get('spill_trees', 50))
+
+
+def fit_spilled(model, X_train, y_train, memory):
+    '''
+    Grow a forest spill_trees trees at a time with warm_start, every batch
+    is written to disk and dropped before the next one grows. The random
+    states are drawn as in a single fit, the trees are the same.
+    Input:
+        model: unfitted forest, left fitted without its trees
+        X_train, y_train: training data
+        memory: dictionary of the memory section of the config, spill_dir
+                is the directory of the files and compress the joblib
+                compression level (default 3)
+    Return:
+        list of (file, bytes of every tree) of the batches, in the
+        directory the caller removes
+    '''
+    os.makedirs(memory['spill_dir'], exist_ok=True)
+    directory = tempfile.mkdtemp(prefix='trees_', dir=memory['spill_dir'])
+    n_estimators = model.get_params()['n_estimators']
+    batch = memory.get('spill_trees', 50)
+    model.set_params(warm_start=True)
+    batches = []
+    done = 0
+    try:
+        while done < n_estimators:
+            model.set_params(n_estimators=min(done + batch, n_estimators))
+            model.fit(X_train, y_train)
+            trees = model.estimators_[done:]
+            path = os.path.join(directory, 'batch_{}.joblib'.format(len(batches)))
+            joblib.dump(trees, path, compress=memory.get('compress', 3))
+            batches.append((path, [model_bytes(tree) for tree in trees]))
+            # warm_start only counts the trees already grown
+            model.estimators_[done:] = [None] * len(trees)
+            del trees
+            done = len(model.estimators_)
+    except BaseException:
+        shutil.rmtree(directory)
+        raise
+    logger.info('grew {} trees of {:.1f} MB in {}'.format(
+        n_estimators, sum(sum(sizes) for _, sizes in batches) / 2.0 ** 20, directory))
+    return batches
+
+
+def spilled_scores(batches, X_test, sizes, chunk=None):
+    '''
+    Scores of the first trees of a forest grown by fit_spilled for every
+    size, the batches are read back one at a time
+    Input:
+        batches: result of fit_spilled
+        X_test: test features
+        sizes: numbers of trees
+        chunk: number of rows scored at once, None scores them all at once
+    Return:
+        dictionary of the scores by size
+    '''
+    # the forest scores float32 features, converted once for every tree
+    if sparse.issparse(X_test):
+        X_test = X_test.astype(np.float32).tocsr()
+    else:
+        X_test = np.asarray(X_test, dtype=np.float32)
+    total = np.zeros(X_test.shape[0])
+    scores = {}
+    grown = 0
+    for path, _ in batches:
+        trees = joblib.load(path)
+        for tree in trees:
+            # summed in the order of the trees as the forest does
+            total += predict_scores('DecisionTreeClassifier', tree, X_test, chunk)
+            grown += 1
+            if grown in sizes:
+                scores[grown] = total / grown
+        del trees
+    return scores
+
+
+def fit_ladder(name, members, X_train, y_train, X_test, memory=None):
+    '''
+    Fit the largest ensemble of a group only differing by n_estimators and
+    score every smaller size from its first estimators or stages, which
+    is what a fit of that size draws with the same random_state
+
+    Input:
+        name: model's name
+        members: list of (index, model) of the group
+        X_train, y_train: training data
+        X_test: test features
+        memory: dictionary of the memory section of the config
+    Return:
+        list of (index, result as fit_and_predict)
+    '''
+    members = sorted(members, key=lambda member: member[1].get_params()['n_estimators'])
+    sizes = [model.get_params()['n_estimators'] for _, model in members]
+    params = [str(model) for _, model in members]
+    model = clone(members[-1][1])
+    logger.info('fitting {} for the sizes {}'.format(model, sizes))
+    rss = reset_peak_rss()
+    if spills(name, model, memory):
+        start = time.time()
+        batches = fit_spilled(model, X_train, y_train, memory)
+        fit_seconds = time.time() - start
+        try:
+            start = time.time()
+            scores = spilled_scores(batches, X_test, sizes, chunk_rows(model, X_test, memory))
+            # the sizes share the pass over the batches
+            predict_seconds = time.time() - start
+        finally:
+            shutil.rmtree(os.path.dirname(batches[0][0]))
+        tree_bytes = [size for _, batch_bytes in batches for size in batch_bytes]
+        base_bytes = model_bytes(model)
+        results = []
+        for i, (index, _) in enumerate(members):
+            stats = fit_stats(X_train, X_test, fit_seconds, predict_seconds, rss,
+                              base_bytes + sum(tree_bytes[:sizes[i]]))
+            results.append((index, {'name': name, 'params': params[i], 'scores': scores[sizes[i]],
+                                    'fit_mode': 'cold', 'stats': stats}))
+        return results
+    start = time.time()
+    model.fit(X_train, y_train)
+    fit_seconds = time.time() - start
+    chunk = chunk_rows(model, X_test, memory)
+    results = []
+    if name in STAGED_MODELS:
+        start = time.time()
+        staged = staged_scores(model, X_test, sizes, chunk)
+        # the sizes share the pass over the stages
+        predict_seconds = time.time() - start
+    for i, (index, _) in enumerate(members):
+        truncated = truncate(model, sizes[i])
+        if name in STAGED_MODELS:
+            y_pred_probs = staged[sizes[i]]
+        else:
+            start = time.time()
+            y_pred_probs = predict_scores(name, truncated, X_test, chunk)
+            predict_seconds = time.time() - start
+        # the sizes share the fit of the largest
+        stats = fit_stats(X_train, X_test, fit_seconds, predict_seconds, rss, truncated)
+        results.append((index, {'name': name, 'params': params[i], 'scores': y_pred_probs,
+                                'fit_mode': 'cold', 'stats': stats}))
+    return results
+
+
+def staged_scores(model, X_test, sizes, chunk=None):
+    '''
+    Scores of the first stages of a boosted ensemble for every size, from
+    one pass over the stages per chunk of rows, only the scores of the
+    sizes are kept
+    Input:
+        model: fitted boosted ensemble
+        X_test: test features
+        sizes: numbers of stages
+        chunk: number of rows scored at once, None scores them all at once
+    Return:
+        dictionary of the scores by size
+    '''
+    chunk = chunk or X_test.shape[0]
+    parts = dict((size, []) for size in sizes)
+    for start in range(0, X_test.shape[0], chunk):
+        kept = {}
+        for stage, y_pred_probs in enumerate(model.staged_predict_proba(X_test[start:start + chunk]), 1):
+            if stage in parts:
+                kept[stage] = y_pred_probs[:, 1]
+        for size in sizes:
+            # boosting may stop before the largest size, later sizes keep the last stage
+            parts[size].append(kept.get(size, y_pred_probs[:, 1]))
+    return dict((size, np.concatenate(scores)) for size, scores in parts.items())
+
+
+def truncate(model, size):
+    '''
+    Shallow copy of a fitted ensemble keeping its first size estimators
+    '''
+    truncated = copy.copy(model)
+    truncated.estimators_ = model.estimators_[:size]
+    truncated.n_estimators = size
+    if hasattr(model, 'estimators_features_'):
+        truncated.estimators_features_ = model.estimators_features_[:size]
+    return truncated
+
+
+def fit_path(name, members, X_train, y_train, X_test, memory=None):
+    '''
+    Fit a group only differing by C in order of increasing C, every fit
+    starts from the coefficients of the previous one
+
+    Input:
+        name: model's name
+        members: list of (index, model) of the group
+        X_train, y_train: training data
+        X_test: test features
+        memory: dictionary of the memory section of the config
+    Return:
+        list of (index, result as fit_and_predict)
+    '''
+    members = sorted(members, key=lambda member: member[1].get_params()['C'])
+    model = copy.deepcopy(members[0][1]).set_params(warm_start=True)
+    logger.info('fitting {} along C {}'.format(
+        name, [member.get_params()['C'] for _, member in members]))
+    results = []
+    for index, member in members:
+        model.set_params(C=member.get_params()['C'])
+        rss = reset_peak_rss()
+        start = time.time()
+        model.fit(X_train, y_train)
+        fit_seconds = time.time() - start
+        start = time.time()
+        y_pred_probs = predict_scores(name, model, X_test, chunk_rows(model, X_test, memory))
+        stats = fit_stats(X_train, X_test, fit_seconds, time.time() - start, rss, model)
+        results.append((index, {'name': name, 'params': str(member), 'scores': y_pred_probs,
+                                'fit_mode': 'cold', 'stats': stats}))
+    return results
+
+
+def fit_neighbors(name, members, X_train, y_train, X_test, projection=None, memory=None):
+    '''
+    Index the training set once and query the largest n_neighbors of the
+    group once, the scores of every n_neighbors and weights of the group
+    come from the first neighbors of that query
+
+    Input:
+        name: model's name
+        members: list of (index, model) of the group
+        X_train, y_train: training data
+        X_test: test features
+        projection: number of dimensions of a sparse random projection of
+                    the features before the search, which makes the
+                    neighbors approximate, None searches the features
+        memory: dictionary of the memory section of the config, budget_mb
+                bounds the distance blocks of the query
+    Return:
+        list of (index, result as fit_and_predict)
+    '''
+    rss = reset_peak_rss()
+    start = time.time()
+    if projection and X_train.shape[1] > projection:
+        logger.info('projecting {} features to {}'.format(X_train.shape[1], projection))
+        projector = SparseRandomProjection(n_components=projection, dense_output=True,
+                                           random_state=0).fit(X_train)
+        X_train = projector.transform(X_train)
+        X_test = projector.transform(X_test)
+    max_k = max(model.get_params()['n_neighbors'] for _, model in members)
+    model = copy.deepcopy(members[0][1]).set_params(n_neighbors=max_k, weights='uniform')
+    model.fit(X_train, y_train)
+    # the brute force query computes the distances block by block within
+    # the working memory
+    working_memory = (memory or {}).get('budget_mb')
+    with config_context(working_memory=working_memory):
+        distances, neighbors = model.kneighbors(X_test, min(max_k, X_train.shape[0]))
+    positive = (np.asarray(y_train) == model.classes_[1])[neighbors]
+    # the members share the index and the query
+    fit_seconds = time.time() - start
+    results = []
+    for index, member in members:
+        start = time.time()
+        params = member.get_params()
+        k = params['n_neighbors']
+        if params['weights'] == 'uniform':
+            weights = np.ones((X_test.shape[0], min(k, neighbors.shape[1])))
+        else:
+            # as KNeighborsClassifier, exact matches take all the weight
+            with np.errstate(divide='ignore'):
+                weights = 1. / distances[:, :k]
+            exact = np.isinf(weights)
+            exact_rows = exact.any(axis=1)
+            weights[exact_rows] = exact[exact_rows]
+        normalizer = weights.sum(axis=1)
+        normalizer[normalizer == 0.0] = 1.0
+        scores = (weights * positive[:, :k]).sum(axis=1) / normalizer
+        stats = fit_stats(X_train, X_test, fit_seconds, time.time() - start, rss, model)
+        results.append((index, {'name': name, 'params': str(member), 'scores': scores,
+                                'fit_mode': 'cold', 'stats': stats}))
+    return results
+
+
+def run_job(kind, name, members, X_train, y_train, X_test, warm_path=None, projection=None,
+            memory=None, features=None):
+    '''
+    Fit and score one job of model_factory.plan_jobs, the models of the
+    job are left unfitted so that no fitted model outlives its job
+    Return:
+        list of (index, result as fit_and_predict) for the members
+    '''
+    if kind == 'neighbors':
+        return fit_neighbors(name, members, X_train, y_train, X_test, projection, memory)
+    if kind == 'ladder':
+        return fit_ladder(name, members, X_train, y_train, X_test, memory)
+    if kind == 'path':
+        return fit_path(name, members, X_train, y_train, X_test, memory)
+    index, model = members[0]
+    logger.info('start to run the model {}'.format(model))
+    return [(index, fit_and_predict(name, clone(model), X_train, y_train, X_test, warm_path,
+                                    memory, features))]
+
+
+def load_warm_state(path):
+    '''
+    Load the fitted model kept by save_warm_state
+    Input:
+        path: the file of the configuration
+    Return:
+        number of training rows, fitted model obj, names of the features,
+        (0, None, None) if missing
+    '''
+    if not os.path.exists(path):
+        return 0, None, None
+    with open(path, 'rb') as state_file:
+        state = pickle.load(state_file)
+    # states kept before the features were recorded cannot be checked
+    if len(state) == 2:
+        return state[0], state[1], None
+    return state
+
+
+def save_warm_state(path, n_rows, model, features=None):
+    '''
+    Keep a fitted model for the next split
+    Input:
+        path: the file of the configuration
+        n_rows: number of rows the model is fitted on
+        model: fitted model obj
+        features: names of the columns the model is fitted on
+    '''
+    if features is not None:
+        features = [str(feature) for feature in features]
+    with open(path + '.tmp', 'wb') as state_file:
+        pickle.dump((n_rows, model, features), state_file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.rename(path + '.tmp', path)
+
+
+def same_features(old, new):
+    '''
+    Whether two fits see the same columns in the same order, unknown
+    names never match
+    '''
+    if old is None or new is None:
+        return False
+    return list(old) == [str(feature) for feature in new]
+
+
+def _pool_run_job(kind, name, members, warm_path=None, projection=None, memory=None):
+    '''
+    run_job on the split data kept in the worker
+    '''
+    # the results keep the parameters of the grid, as in a serial run
+    params = dict((index, str(model)) for index, model in members)
+    # the pool already uses every core, avoid oversubscription
+    for _, model in members:
+        if model.get_params().get('n_jobs') not in (None, 1):
+            model.set_params(n_jobs=1)
+    results = run_job(kind, name, members, _split_data['X_train'], _split_data['y_train'],
+                      _split_data['X_test'], warm_path, projection, memory,
+                      _split_data.get('features'))
+    for index, result in results:
+        result['params'] = params[index]
+    return results
+
+
+def run_models(models, handles, workers=1, warm_paths=None, projection=None, memory=None):
+    '''
+    Fit and score every model of the grid on one split, the models one
+    fit can serve are grouped by model_factory.plan_jobs
+
+    Input:
+        models: list of (name, model) from the model factory
+        handles: dictionary of the stored X_train, y_train and X_test,
+                 shared_store.matrix_store.handles
+        workers: number of worker processes, 1 runs in this process
+        warm_paths: list of warm start files aligned with models, None
+                    fits every model from scratch. The models with a warm
+                    start file are fitted one by one.
+        projection: dimensions of the approximate neighbor search, None
+                    for the exact search
+        memory: dictionary of the memory section of the config, None
+                scores the test set at once and keeps the models in memory
+    Return:
+        A generator of (index, result of fit_and_predict), in the order
+        of models whatever order the jobs finish in
+    '''
+    grouped = True if warm_paths is None else [path is None for path in warm_paths]
+    jobs = model_factory.plan_jobs(models, grouped)
+    if warm_paths is None:
+        warm_paths = [None] * len(models)
+    logger.info('{} models in {} fits'.format(len(models), len(jobs)))
+    if workers <= 1:
+        _init_worker(handles)
+        try:
+            finished = (run_job(kind, name, members, _split_data['X_train'], _split_data['y_train'],
+                                _split_data['X_test'], warm_paths[members[0][0]], projection,
+                                memory, _split_data.get('features'))
+                        for kind, name, members in jobs)
+            for item in _in_order(finished):
+                yield item
+        finally:
+            _split_data.clear()
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(handles,)) as pool:
+        # longest first, a long fit submitted last would run alone at the end
+        futures = [pool.submit(_pool_run_job, kind, name, members, warm_paths[members[0][0]],
+                               projection, memory)
+                   for kind, name, members in model_factory.schedule(jobs)]
+        logger.info('submitted {} fits to {} workers'.format(len(futures), workers))
+        for item in _in_order(future.result() for future in as_completed(futures)):
+            yield item
+
+
+def _in_order(finished):
+    '''
+    Release the results of the jobs in the order of the models
+    Input:
+        finished: iterable of the lists of (index, result) of the jobs
+    Return:
+        A generator of (index, result) by increasing index
+    '''
+    buffered = {}
+    next_index = 0
+    for results in finished:
+        buffered.update(results)
+        while next_index in buffered:
+            yield next_index, buffered.pop(next_index)
+            next_index += 1
@@ -4,10 +4,12 @@ Get the dummies in the features generation stage
 
 import numpy as np
 import pandas as pd
+from scipy import sparse
 import logging
 import sys
 import os
 import gc
+import pickle
 
 logger = logging.getLogger('get dummy')
 ch = logging.StreamHandler(sys.stdout)
@@ -17,6 +19,135 @@ logger.addHandler(ch)
 logger.setLevel(logging.INFO)
 
 
+class top_k_encoder():
+
+    '''
+    The class learns the dummies of one categorical column from the training
+    data once, and maps any later data with the same vocabulary. It only
+    keeps plain attributes so it can be pickled with the models.
+    '''
+
+    def __init__(self, colname, k=None):
+        '''
+        Inputs:
+            colname: the name of the column
+            k: (int) keep the top k categories and an others dummy,
+               None keeps every category
+        '''
+        self.colname = colname
+        self.k = k
+        self.categories = []
+        self.others = False
+
+    def fit(self, X_train):
+        '''
+        Learn the categories from the training data
+        Inputs:
+            X_train: a data frame of training set
+        Return:
+            the fitted encoder
+        '''
+        counts = count_categories(X_train[self.colname])
+        if self.k is None or len(counts) <= self.k:
+            self.categories = list(counts.index)
+            self.others = False
+        else:
+            self.categories = list(counts.index[:self.k])
+            self.others = True
+        return self
+
+    def get_feature_names(self):
+        '''
+        Names of the dummies, in the order of the encoded columns
+        '''
+        names = list(self.categories)
+        if self.others:
+            names.append('{}_others'.format(self.colname))
+        return names
+
+    def transform_codes(self, X):
+        '''
+        Map every value to the position of its dummy
+        Inputs:
+            X: a data frame with the column
+        Return:
+            numpy array of int, -1 for a value without dummy
+        '''
+        codes = pd.Index(self.categories).get_indexer(X[self.colname])
+        if self.others:
+            codes = np.where(codes < 0, len(self.categories), codes)
+        return codes
+
+    def transform_dense(self, X):
+        '''
+        Add one int64 column per dummy to the data frame
+        Inputs:
+            X: a data frame with the column
+        '''
+        codes = self.transform_codes(X)
+        for position, name in enumerate(self.get_feature_names()):
+            X[name] = (codes == position).astype(np.int64)
+
+    def transform_sparse(self, X):
+        '''
+        Encode the column as a sparse block of dummies
+        Inputs:
+            X: a data frame with the column
+        Return:
+            scipy csr matrix with one column per dummy
+        '''
+        codes = self.transform_codes(X)
+        rows = np.flatnonzero(codes >= 0)
+        return sparse.csr_matrix((np.ones(len(rows)), (rows, codes[rows])),
+                                 shape=(len(codes), len(self.get_feature_names())))
+
+    def save(self, path):
+        '''
+        Pickle the fitted encoder
+        '''
+        with open(path, 'wb') as encoder_file:
+            pickle.dump(self, encoder_file)
+
+
+def count_categories(series):
+    '''
+    Count every category, most frequent first and ties in the order they
+    first appear, whatever the dtype of the column
+    Inputs:
+        series: the column
+    Return:
+        series of counts indexed by category
+    '''
+    counts = series.value_counts(sort=False)
+    counts = counts.reindex(pd.unique(series.dropna()))
+    return counts.sort_values(ascending=False, kind='mergesort')
+
+
+def load_encoder(path):
+    '''
+    Load an encoder saved by top_k_encoder.save
+    '''
+    with open(path, 'rb') as encoder_file:
+        return pickle.load(encoder_file)
+
+
+def fit_encoder(X_train, colname, k):
+    '''
+    Fit the encoder of one column the way get_dummies decides, every
+    category for zip code or when there are at most k of them, otherwise
+    the top k categories and an others dummy
+    Inputs:
+        X_train: a data frame of training set
+        colname: the name of the column
+        k: (int) the value of k
+    Return:
+        fitted top_k_encoder
+    '''
+    if colname == 'zip code':
+        k = None
+    return top_k_encoder(colname, k).fit(X_train)
+
+
 def get_all_dummies(X_train, X_test, colname):
     '''
     Convert the categorical variable into dummies
@@ -28,12 +159,10 @@ def get_all_dummies(X_train, X_test, colname):
         the data frame with those dummies into data frame
     '''
     # Get the categories from training data set
-    cat_list = list(X_train[colname].value_counts().index.values)
+    encoder = top_k_encoder(colname).fit(X_train)
     # create dummies
-    # logger.info('generate the dummy on column {}'.format(colname))
-    for cat in cat_list:
-        X_test[cat] = np.where(X_test[colname] == cat, 1, 0)
-        X_train[cat] = np.where(X_train[colname] == cat, 1, 0)
+    encoder.transform_dense(X_test)
+    encoder.transform_dense(X_train)
     gc.collect()
 
 
@@ -49,21 +178,14 @@ def get_top_k_dummies(X_train, X_test, colname, k):
     Outputs:
        Create dummies in both train and test set
     '''
-    # get top k categories from train set
-    top_k = X_train[colname].value_counts()[:k].index
-    # create dummies
-    #logger.info('generate dummies on column {} of top {} values'.format(colname, k))
-    for cat in top_k:
-        X_train[cat] = np.where(X_train[colname] == cat, 1, 0)
-        X_test[cat] = np.where(X_test[colname] == cat, 1, 0)
-    X_train['{}_others'.format(colname)] = X_train.apply(
-        lambda x: 0 if x[colname] in top_k else 1, axis=1)
-    X_test['{}_others'.format(colname)] = X_test.apply(
-        lambda x: 0 if x[colname] in top_k else 1, axis=1)
+    # get top k categories from train set, the others flag is vectorized
+    encoder = top_k_encoder(colname, k).fit(X_train)
+    encoder.transform_dense(X_train)
+    encoder.transform_dense(X_test)
     gc.collect()
 
 
-def get_dummies(X_train, X_test, colname, k):
+def get_dummies(X_train, X_test, colname, k, encoder=None):
     '''
     Wrap up get_all_dummies and get_top_k_dummies
     Inputs:
@@ -71,17 +193,44 @@ def get_dummies(X_train, X_test, colname, k):
         X_test: a data frame of test set
         colname: the name of the column
         k: (int) the value of k
+        encoder: fitted top_k_encoder of the column to reuse, None fits
+                 one on X_train
     Outputs:
        Create dummies in both train and test set
     '''
     # Decide whether this use get all dummies or top k
     logger.info("get dummy for {}".format(colname))
-    num_cat = len(X_train[colname].value_counts())
-    
-    if num_cat <= k or colname=='zip code':
-        get_all_dummies(X_train, X_test, colname)
-    else:
-         get_top_k_dummies(X_train, X_test, colname, k)          
+    if encoder is None:
+        encoder = fit_encoder(X_train, colname, k)
+    encoder.transform_dense(X_train)
+    encoder.transform_dense(X_test)
+    gc.collect()
     return X_train.drop(columns=[colname]), X_test.drop(columns=[colname])
   
 
+
+def get_sparse_dummies(X_train, X_test, colnames, k, encoders=None):
+    '''
+    Build sparse design matrices, the columns not in colnames are kept as
+    they are and followed by the dummies of every column in colnames
+    Inputs:
+        X_train: a data frame of training set
+        X_test: a data frame of test set
+        colnames: the columns to convert into dummies
+        k: (int) the value of k
+        encoders: dictionary of fitted top_k_encoder by column to reuse,
+                  None fits them on X_train
+    Return:
+        train and test scipy csr matrices
+    '''
+    train_blocks = [sparse.csr_matrix(X_train.drop(columns=colnames).values.astype(float))]
+    test_blocks = [sparse.csr_matrix(X_test.drop(columns=colnames).values.astype(float))]
+    for col in colnames:
+        logger.info("get sparse dummy for {}".format(col))
+        encoder = encoders[col] if encoders else fit_encoder(X_train, col, k)
+        train_blocks.append(encoder.transform_sparse(X_train))
+        test_blocks.append(encoder.transform_sparse(X_test))
+    X_train = sparse.hstack(train_blocks, format='csr')
+    X_test = sparse.hstack(test_blocks, format='csr')
+    gc.collect()
+    return X_train, X_test
@@ -0,0 +1,108 @@
+'''
+Successive halving search over the model grid: every candidate is fitted
+on a sample of the training rows and ranked on the most recent training
+rows, only the best fraction goes on to a larger sample
+'''
+from sklearn.base import clone
+import numpy as np
+import pandas as pd
+import logging
+import math
+import sys
+from pipeline import evaluator
+from pipeline import executor
+from pipeline import shared_store
+
+logger = logging.getLogger('halving search')
+ch = logging.StreamHandler(sys.stdout)
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+logger.setLevel(logging.INFO)
+
+HISTORY_COLUMNS = ['model_name', 'parameters', 'round', 'n_rows', 'precision', 'promoted']
+
+
+def sample_rows(y, n_rows, random_state):
+    '''
+    Sample rows keeping the share of every class
+    Inputs:
+        y: labels of the rows to sample from
+        n_rows: number of rows wanted
+        random_state: numpy RandomState
+    Returns: sorted positions of the sampled rows
+    '''
+    if n_rows >= len(y):
+        return np.arange(len(y))
+    rows = []
+    for label in np.unique(y):
+        positions = np.flatnonzero(y == label)
+        wanted = max(1, int(round(n_rows * len(positions) / float(len(y)))))
+        rows.append(random_state.choice(positions, min(wanted, len(positions)), replace=False))
+    return np.sort(np.concatenate(rows))
+
+
+def successive_halving(models, store, search_config, k, workers=1, projection=None):
+    '''
+    Select the models of the grid worth a fit on the whole training set.
+    The last validation_fraction of the training rows, the most recent
+    ones, are held out for the ranking, the first round fits every model
+    on min_fraction of the other rows and every round keeps the best
+    1 / factor of the models by precision at k for a sample factor times
+    larger, until one model is left or the sample is every row.
+
+    Inputs:
+        models: list of (name, model)
+        store: shared_store.matrix_store of the split, rows sorted by time
+        search_config: the search options of the models section,
+                       factor (default 3), min_fraction (default 0.1),
+                       validation_fraction (default 0.2), k (default the
+                       percentage of the matrix section)
+        k: default percentage of the precision used for the ranking
+        workers: number of worker processes
+        projection: dimensions of the approximate neighbor search
+    Returns:
+        the positions in models of the selected models, and the dataframe
+        of the budget history of every model
+    '''
+    factor = search_config.get('factor', [3])[0]
+    min_fraction = search_config.get('min_fraction', [0.1])[0]
+    validation_fraction = search_config.get('validation_fraction', [0.2])[0]
+    k = search_config.get('k', [k])[0]
+    random_state = np.random.RandomState(search_config.get('random_state', [0])[0])
+
+    X_train = store.get('X_train')
+    y_train = np.asarray(store.get('y_train'))
+    n_fit = X_train.shape[0] - int(X_train.shape[0] * validation_fraction)
+    y_fit = y_train[:n_fit]
+    y_val = y_train[n_fit:]
+    candidates = list(range(len(models)))
+    n_rows = max(int(n_fit * min_fraction), 1)
+    history = []
+    search_round = 0
+    while len(candidates) > 1:
+        rows = sample_rows(y_fit, n_rows, random_state)
+        logger.info('round {}: {} models on {} rows'.format(search_round, len(candidates), len(rows)))
+        precision = {}
+        with shared_store.matrix_store() as round_store:
+            round_store.put('X_train', X_train[rows])
+            round_store.put('y_train', y_fit[rows])
+            round_store.put('X_test', X_train[n_fit:])
+            round_models = [(models[c][0], clone(models[c][1])) for c in candidates]
+            for i, result in executor.run_models(round_models, round_store.handles,
+                                                 workers, projection=projection):
+                precision[candidates[i]] = evaluator.metrics_at_k(
+                    y_val, result['scores'], [k])['precision'][0]
+        # stable ranking, ties keep the order of the grid
+        ranked = sorted(candidates, key=lambda c: -precision[c])
+        promoted = set(ranked[:max(1, int(math.ceil(len(ranked) / float(factor))))])
+        for c in candidates:
+            history.append([models[c][0], str(models[c][1]), search_round, len(rows),
+                            precision[c], c in promoted])
+        candidates = [c for c in candidates if c in promoted]
+        if len(rows) >= n_fit:
+            break
+        n_rows *= factor
+        search_round += 1
+    logger.info('{} of {} models selected'.format(len(candidates), len(models)))
+    return candidates, pd.DataFrame(history, columns=HISTORY_COLUMNS)
@@ -0,0 +1,150 @@
+'''
+Load the configured columns of the data set with compact types, and keep a
+columnar binary copy of them for memory-mapped reloads
+'''
+import hashlib
+import json
+import logging
+import shutil
+import sys
+import os
+import numpy as np
+import pandas as pd
+from pipeline import transform_cache
+
+logger = logging.getLogger('loader')
+ch = logging.StreamHandler(sys.stdout)
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+logger.setLevel(logging.INFO)
+
+# written last, a directory without it is incomplete
+MANIFEST = 'manifest.json'
+
+
+def get_dtypes(cols_config, trans_configs):
+    '''
+    Decide the type of every loaded column, category for the categorical
+    columns, int16 for the time column, int8 for the label and float32 for
+    every other feature
+    Inputs:
+        cols_config: the cols section of the config
+        trans_configs: the transform section of the config
+    Returns: dictionary of column to dtype, in the order of the columns
+    '''
+    categorical = set(trans_configs['imputation']['cols']) | set(trans_configs['dummy']['cols'])
+    time_cols = set(cols_config.get('time_col', []))
+    dtypes = {}
+    for col in cols_config['x_cols']:
+        if col in categorical:
+            dtypes[col] = 'category'
+        elif col in time_cols:
+            dtypes[col] = np.int16
+        else:
+            dtypes[col] = np.float32
+    for col in cols_config['y_col']:
+        dtypes[col] = np.int8
+    return dtypes
+
+
+def read_csv(input_path, dtypes):
+    '''
+    Read only the wanted columns of the csv with their compact types
+    Inputs:
+        input_path: the csv file
+        dtypes: dictionary of column to dtype
+    Returns: dataframe
+    '''
+    logger.info('reading {} columns of {}'.format(len(dtypes), input_path))
+    df = pd.read_csv(input_path, usecols=list(dtypes), dtype=dtypes)
+    for col, dtype in dtypes.items():
+        if dtype == 'category':
+            # the parser keeps categories as strings, restore numeric codes
+            try:
+                categories = pd.to_numeric(df[col].cat.categories)
+            except (ValueError, TypeError):
+                continue
+            df[col] = df[col].cat.rename_categories(categories)
+    return df[list(dtypes)]
+
+
+def save_columnar(df, directory, identity):
+    '''
+    Write every column as its own .npy file, categorical columns as their
+    codes and categories
+    Inputs:
+        df: dataframe
+        directory: where to write the columns
+        identity: json serializable description of the content
+    '''
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+    columns = []
+    for position, col in enumerate(df.columns):
+        file_name = 'col_{}'.format(position)
+        series = df[col]
+        if series.dtype.name == 'category':
+            np.save(os.path.join(directory, file_name + '.npy'), series.cat.codes.values)
+            np.save(os.path.join(directory, file_name + '.categories.npy'),
+                    np.asarray(series.cat.categories), allow_pickle=True)
+            kind = 'category'
+        else:
+            np.save(os.path.join(directory, file_name + '.npy'), series.values)
+            kind = str(series.dtype)
+        columns.append({'name': col, 'file': file_name, 'kind': kind})
+    path = os.path.join(directory, MANIFEST)
+    with open(path + '.tmp', 'w') as manifest_file:
+        json.dump({'identity': identity, 'columns': columns, 'rows': len(df)}, manifest_file)
+    os.rename(path + '.tmp', path)
+
+
+def load_columnar(directory):
+    '''
+    Rebuild the dataframe written by save_columnar from memory maps
+    Inputs:
+        directory: the directory of the columns
+    Returns: dataframe
+    '''
+    with open(os.path.join(directory, MANIFEST)) as manifest_file:
+        manifest = json.load(manifest_file)
+    data = {}
+    for col in manifest['columns']:
+        # a plain array on the map, the frame keeps it without a copy
+        values = np.load(os.path.join(directory, col['file'] + '.npy'), mmap_mode='r').view(np.ndarray)
+        if col['kind'] == 'category':
+            categories = np.load(os.path.join(directory, col['file'] + '.categories.npy'),
+                                 allow_pickle=True)
+            # the codes were written by save_columnar, validating them would copy them
+            values = pd.Categorical.from_codes(values, categories, validate=False)
+        data[col['name']] = values
+    return pd.DataFrame(data, columns=[col['name'] for col in manifest['columns']], copy=False)
+
+
+def load_dataset(io_config, cols_config, trans_configs):
+    '''
+    Load the columns the pipeline uses. With io columnar_dir set, the csv
+    is converted once and later runs memory map the binary columns.
+    Inputs:
+        io_config: the io section of the config
+        cols_config: the cols section of the config
+        trans_configs: the transform section of the config
+    Returns: dataframe with the x_cols and y_col
+    '''
+    input_path = io_config['input_path']
+    dtypes = get_dtypes(cols_config, trans_configs)
+    columnar_dir = io_config.get('columnar_dir')
+    if not columnar_dir:
+        return read_csv(input_path, dtypes)
+
+    identity = {'data': transform_cache.fingerprint_file(input_path),
+                'dtypes': [(col, str(dtype)) for col, dtype in dtypes.items()]}
+    text = json.dumps(identity, sort_keys=True)
+    directory = os.path.join(columnar_dir, hashlib.sha1(text.encode('utf-8')).hexdigest())
+    if os.path.exists(os.path.join(directory, MANIFEST)):
+        logger.info('loading columns from {}'.format(directory))
+        return load_columnar(directory)
+    df = read_csv(input_path, dtypes)
+    save_columnar(df, directory, identity)
+    logger.info('saved columns to {}'.format(directory))
+    return df
@@ -14,7 +14,22 @@ def min_max_transformation(train_df, test_df, continuous_columns):
     Returns: updated dataframes
     '''
     scaler = MinMaxScaler()
-    train_df_cont = scaler.fit_transform(train_df[continuous_columns])
+    scaler.fit(train_df[continuous_columns])
+    return min_max_apply(scaler, train_df, test_df, continuous_columns)
+
+
+def min_max_apply(scaler, train_df, test_df, continuous_columns):
+    '''
+    This function is used to transform both training and testing dataframe
+    with a fitted scaler
+    Inputs:
+        scaler: fitted MinMaxScaler
+        train_df: training dataframe
+        test_df: testing dataframe
+        continuous_columns: the columns the scaler is fitted on
+    Returns: updated dataframes
+    '''
+    train_df_cont = scaler.transform(train_df[continuous_columns])
     test_df_cont = scaler.transform(test_df[continuous_columns])
 
     train_df = train_df.drop(continuous_columns, axis=1).reset_index(drop=True)
@@ -11,6 +11,7 @@ from sklearn.ensemble import AdaBoostClassifier
 from sklearn.naive_bayes import GaussianNB
 from sklearn.neighbors import KNeighborsClassifier
 from sklearn.svm import LinearSVC
+from sklearn.base import clone
 
 import yaml
 from collections import OrderedDict
@@ -19,6 +20,7 @@ import logging
 import sys
 import numpy as np
 import argparse
+import warnings
 import os
 
 logger = logging.getLogger('generating models')
@@ -28,25 +30,310 @@ ch.setFormatter(formatter)
 logger.addHandler(ch)
 logger.setLevel(logging.INFO)
 
+# key of the search options in the models section, not a model
+SEARCH_KEY = 'search'
+
 def get_models(config):
     '''
     model factory generate the next aviable model 
-    from the config file
+    from the config file. Every combination is canonicalized, checked by
+    a fit on a small sample and deduplicated before the first one is
+    delivered, so a bad config fails before any data is loaded.
     
     Input: 
         config: OrdedDict with the key as the name of the model, value as the parameters 
     Return:
-        A iterable of models
+        A iterable of (name, model)
     ''' 
     logger.info('begin to generate the models')
-    #pdb.set_trace()
+    models = []
+    seen = set()
+    errors = []
+    n_combinations = 0
     for name, params in config.items():
-        constructor = globals()[name]
-        if name == 'GaussianNB':
-            models =  [constructor()]
+        if name == SEARCH_KEY:
+            continue
+        if name not in MODELS:
+            errors.append('{}: unknown model, use one of {}'.format(name, ', '.join(MODELS)))
+            continue
+        # a model without parameters, like GaussianNB, is its defaults
+        params = params or {}
+        for vals in product(*params.values()):
+            n_combinations += 1
+            model_params = canonicalize(name, dict(zip(params.keys(), vals)))
+            try:
+                model = MODELS[name](**model_params)
+                check_fit(model)
+            except Exception as error:
+                errors.append('{}({}): {}'.format(name, model_params, error))
+                continue
+            key = (name, tuple(canonical_params(model)))
+            if key in seen:
+                logger.info('dropping duplicate {}'.format(model))
+                continue
+            seen.add(key)
+            models.append((name, model))
+    if errors:
+        raise ValueError('invalid model configs:\n' + '\n'.join(errors))
+    logger.info('{} runnable models from {} combinations, {} duplicates dropped'.format(
+        len(models), n_combinations, n_combinations - len(models)))
+    for name, model in models:
+        logger.info('{} is delivering out'.format(model))
+        yield name, model
+
+
+MODELS = OrderedDict((constructor.__name__, constructor) for constructor in (
+    DecisionTreeClassifier, RandomForestClassifier, ExtraTreesClassifier, LogisticRegression,
+    BaggingClassifier, GradientBoostingClassifier, AdaBoostClassifier, GaussianNB,
+    KNeighborsClassifier, LinearSVC))
+
+def canonicalize(name, params):
+    '''
+    rewrite the parameters of one combination which the installed
+    scikit-learn would reject into their equivalent accepted form
+
+    Input:
+        name: model's name
+        params: dictionary of the parameters of the config
+    Return:
+        dictionary of the parameters
+    '''
+    params = dict(params)
+    if name == 'LogisticRegression' and params.get('penalty') == 'l1' and 'solver' not in params:
+        # the default solver of recent versions has no l1 penalty, saga has
+        # one and starts from the previous coefficients along a C path
+        params['solver'] = 'saga'
+    if name == 'LinearSVC' and params.get('penalty') == 'l1' and 'dual' not in params:
+        params['dual'] = False
+    if name == 'AdaBoostClassifier' and 'algorithm' in params:
+        accepted = AdaBoostClassifier().get_params()
+        if 'algorithm' not in accepted:
+            # SAMME is the only algorithm left
+            del params['algorithm']
+        elif params['algorithm'] == 'SAMME.R' and not _accepts(AdaBoostClassifier, algorithm='SAMME.R'):
+            params['algorithm'] = 'SAMME'
+    return params
+
+def _accepts(constructor, **params):
+    '''
+    whether a model accepts the parameters at fit time
+    '''
+    try:
+        check_fit(constructor(**params))
+    except Exception:
+        return False
+    return True
+
+# small sample every config is fitted on before the run
+_CHECK_RNG = np.random.RandomState(0)
+CHECK_X = _CHECK_RNG.rand(40, 4)
+CHECK_Y = np.arange(40) % 2
+
+def check_fit(model):
+    '''
+    fit and score a copy of the model on a small sample, the size of
+    ensembles and neighborhoods is reduced to the sample
+    Input:
+        model: model obj
+    Return:
+        raise the error of the fit
+    '''
+    model = clone(model)
+    params = model.get_params()
+    if 'n_estimators' in params:
+        model.set_params(n_estimators=min(params['n_estimators'], 2))
+    if 'n_neighbors' in params:
+        model.set_params(n_neighbors=min(params['n_neighbors'], 5))
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        model.fit(CHECK_X, CHECK_Y)
+        if hasattr(model, 'predict_proba'):
+            model.predict_proba(CHECK_X)
         else:
-            models = [constructor(**dict(zip(params.keys(),vals))) for vals in product(*params.values())]
-        for model in models:
-            logger.info('{} is delivering out'.format(model))
-            yield name, model
+            model.decision_function(CHECK_X)
+
+
+# parameters which change how a model is fitted but not the fitted model
+IGNORED_PARAMS = ('n_jobs', 'verbose')
+
+def canonical_params(model):
+    '''
+    canonical form of the parameters of a model, used to identify the
+    same configuration across runs
+
+    Input:
+        model: model obj
+    Return:
+        sorted list of (parameter, repr of value)
+    '''
+    params = model.get_params(deep=False)
+    return [(key, repr(params[key])) for key in sorted(params)
+            if key not in IGNORED_PARAMS]
+
+
+# models whose fitted state can carry over to a larger training window
+WARM_START_MODELS = ('GradientBoostingClassifier', 'RandomForestClassifier',
+                     'ExtraTreesClassifier', 'LogisticRegression')
+
+def warm_start_from(name, model, previous, n_old, n_new):
+    '''
+    prepare the fit of a model on a training window which extends the
+    window the same configuration was fitted on before. Ensembles keep the
+    share of their trees or stages the old rows account for and grow the
+    rest on the new window, logistic regression starts from the previous
+    coefficients.
+
+    Input:
+        name: model's name
+        model: the unfitted model obj of the configuration
+        previous: the fitted model obj of the last window, or None
+        n_old: number of rows previous is fitted on
+        n_new: number of rows of the new window
+    Return:
+        the model obj to fit, whether it reuses the previous state
+    '''
+    if name not in WARM_START_MODELS or previous is None or not 0 < n_old < n_new:
+        return model, False
+    if name == 'LogisticRegression':
+        # liblinear ignores warm_start
+        if previous.get_params()['solver'] == 'liblinear':
+            return model, False
+        previous.set_params(warm_start=True)
+        return previous, True
+
+    keep = int(round(model.get_params()['n_estimators'] * n_old / float(n_new)))
+    if keep < 1:
+        return model, False
+    previous.estimators_ = previous.estimators_[:keep]
+    if name == 'GradientBoostingClassifier':
+        previous.train_score_ = previous.train_score_[:keep]
+        for attr in ('oob_improvement_', 'oob_scores_'):
+            if hasattr(previous, attr):
+                setattr(previous, attr, getattr(previous, attr)[:keep])
+    previous.set_params(warm_start=True)
+    return previous, True
+
+
+# models whose grid sizes one fit of the largest ensemble can score
+LADDER_MODELS = ('RandomForestClassifier', 'ExtraTreesClassifier', 'BaggingClassifier',
+                 'GradientBoostingClassifier', 'AdaBoostClassifier')
+
+# solvers of LogisticRegression which start from the previous coefficients
+# with warm_start, liblinear (also behind 'warn' and LinearSVC) always
+# starts from zero
+WARM_START_SOLVERS = ('lbfgs', 'newton-cg', 'newton-cholesky', 'sag', 'saga')
+
+# parameters the members of a group of each kind may differ by
+SWEPT_PARAMS = {'ladder': ('n_estimators',), 'path': ('C',),
+                'neighbors': ('n_neighbors', 'weights')}
+
+def job_kind(name, model):
+    '''
+    how the models of one name are grouped into fits
+    Input:
+        name: model's name
+        model: model obj
+    Return:
+        'ladder', 'path', 'neighbors' or 'single'
+    '''
+    if name in LADDER_MODELS:
+        return 'ladder'
+    if name == 'KNeighborsClassifier' and model.get_params()['weights'] in ('uniform', 'distance'):
+        return 'neighbors'
+    if name == 'LogisticRegression' and model.get_params()['solver'] in WARM_START_SOLVERS:
+        return 'path'
+    return 'single'
+
+def liblinear(name, model):
+    '''
+    whether a model is fitted by liblinear, which has no warm start
+    '''
+    return name == 'LinearSVC' or (name == 'LogisticRegression'
+                                   and model.get_params()['solver'] not in WARM_START_SOLVERS)
 
+def plan_jobs(models, grouped=True):
+    '''
+    group the models of a grid which share one fit, ensembles only
+    differing by n_estimators are fitted once at the largest size and
+    logistic regressions only differing by C are fitted along the path
+    of increasing C, nearest neighbors only differing by n_neighbors or
+    weights share one neighbor query
+
+    Input:
+        models: list of (name, model)
+        grouped: False fits every model on its own, or a list of booleans
+                 aligned with models, the models set to False are fitted
+                 on their own
+    Return:
+        list of (kind, name, members), members is the list of (index in
+        models, model) served by the fit, kind is 'single', 'ladder',
+        'path' or 'neighbors'
+    '''
+    jobs = []
+    groups = {}
+    # C grids of liblinear, which cannot share a path
+    unshared = {}
+    if not isinstance(grouped, (list, tuple)):
+        grouped = [grouped] * len(models)
+    for index, (name, model) in enumerate(models):
+        kind = job_kind(name, model) if grouped[index] else 'single'
+        if kind == 'single':
+            if grouped[index] and liblinear(name, model):
+                key = (name, tuple(param for param in canonical_params(model) if param[0] != 'C'))
+                unshared[key] = unshared.get(key, 0) + 1
+            jobs.append((kind, name, [(index, model)]))
+            continue
+        key = (name, tuple(param for param in canonical_params(model)
+                           if param[0] not in SWEPT_PARAMS[kind]))
+        if key not in groups:
+            groups[key] = (kind, name, [])
+            jobs.append(groups[key])
+        groups[key][2].append((index, model))
+    for (name, _), count in unshared.items():
+        if count > 1:
+            logger.info('{} {} models only differing by C are fitted independently, liblinear '
+                        'does not start from the previous coefficients'.format(count, name))
+    # a group of one model is an ordinary fit, except the neighbor search
+    # which may be approximate
+    return [(kind if len(members) > 1 or kind == 'neighbors' else 'single', name, members)
+            for kind, name, members in jobs]
+
+
+# rough time of a fit relative to a decision tree, for the scheduling
+RELATIVE_COST = {'GaussianNB': 0.1, 'AdaBoostClassifier': 0.3, 'ExtraTreesClassifier': 0.7,
+                 'DecisionTreeClassifier': 1.0, 'RandomForestClassifier': 1.0,
+                 'BaggingClassifier': 1.0, 'GradientBoostingClassifier': 1.0,
+                 'LogisticRegression': 2.0, 'LinearSVC': 2.0, 'KNeighborsClassifier': 5.0}
+
+
+def job_weight(kind, name, members):
+    '''
+    Rough relative cost of a job of model_factory.plan_jobs, which grows
+    with the number of estimators, the depth of the trees and the number
+    of fits along a path
+    Inputs:
+        kind, name, members: the job
+    Returns: the weight, only meaningful compared to other weights
+    '''
+    weights = []
+    for _, model in members:
+        params = model.get_params()
+        weight = RELATIVE_COST.get(name, 1.0) * max(params.get('n_estimators', 1), 1)
+        if 'max_depth' in params:
+            # unlimited trees grow about as deep as 30 levels
+            weight *= min(params['max_depth'] or 30, 30) / 5.0
+        weights.append(weight)
+    if kind == 'path':
+        return sum(weights)
+    return max(weights)
+
+
+def schedule(jobs):
+    '''
+    Order the jobs longest first, so that the long fits do not end up
+    alone at the tail of a pool
+    Inputs:
+        jobs: list of (kind, name, members)
+    Returns: the jobs by decreasing job_weight
+    '''
+    return sorted(jobs, key=lambda job: -job_weight(*job))
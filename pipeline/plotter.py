@@ -0,0 +1,153 @@
+'''
+Render the precision recall and roc curves of the models in a background
+pool of processes, so that the fits do not wait for the figures
+'''
+from concurrent.futures import ProcessPoolExecutor
+import heapq
+import logging
+import sys
+import matplotlib
+from pipeline import evaluator
+
+logger = logging.getLogger('plotter')
+ch = logging.StreamHandler(sys.stdout)
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+logger.setLevel(logging.INFO)
+
+# what to plot, in the plots option of the matrix section
+PLOT_MODES = ('all', 'top', 'combined', 'none')
+# plots waiting in the pool per worker before the caller waits
+PENDING_PER_WORKER = 4
+
+
+def _init_worker():
+    '''
+    headless backend in every plotting process
+    '''
+    matplotlib.use('Agg')
+
+
+def plot_model(y_test, y_score, name, params, pr_name, roc_name):
+    '''
+    Save the precision recall and the roc curves of one model
+    '''
+    evaluator.plot_precision_recall_n(y_test, y_score, params, pr_name, 'save')
+    evaluator.plot_roc(params, roc_name, y_score, y_test, 'save')
+
+
+class plotter():
+
+    '''
+    The class collects the scores of the models of a split and renders
+    their curves, every model as it comes, only the top_n models by
+    precision at the configured percentage at the end of the split, or
+    the top_n models on one combined figure per split
+    '''
+
+    def __init__(self, matrix_configs, suffix=''):
+        '''
+        Inputs:
+            matrix_configs: the matrix section of the config, with plots
+                            one of PLOT_MODES (default 'all'), plot_top_n
+                            (default 5) and plot_workers (default 1, 0
+                            renders in this process)
+            suffix: appended to the file names, '_warm' for the warm fits
+        '''
+        self.matrix_configs = matrix_configs
+        self.suffix = suffix
+        self.mode = matrix_configs.get('plots', ['all'])[0]
+        if self.mode not in PLOT_MODES:
+            raise ValueError('plots must be one of {}, got {}'.format(PLOT_MODES, self.mode))
+        self.top_n = matrix_configs.get('plot_top_n', [5])[0]
+        self.workers = matrix_configs.get('plot_workers', [1])[0]
+        self.pool = None
+        if self.workers > 0 and self.mode != 'none':
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        self.pending = []
+        self.best = []
+
+    def add(self, count, index, name, params, y_test, y_score):
+        '''
+        Take the scores of one model
+        Inputs:
+            count: number of the split
+            index: row of the model in the results
+            name: model's name
+            params: parameters of the model as string
+            y_test: true y
+            y_score: scores of the model
+        '''
+        if self.mode == 'none':
+            return
+        if self.mode == 'all':
+            self.plot(count, index, name, params, y_test, y_score)
+            return
+        precision = evaluator.metrics_at_k(
+            y_test, y_score, [self.matrix_configs['percentage']])['precision'][0]
+        # min heap of the best models, ties keep the earlier rows
+        item = (precision, -index, name, params, y_test, y_score)
+        if len(self.best) < self.top_n:
+            heapq.heappush(self.best, item)
+        elif item[:2] > self.best[0][:2]:
+            heapq.heapreplace(self.best, item)
+
+    def end_split(self, count):
+        '''
+        Render the plots kept for the end of the split
+        Inputs:
+            count: number of the split
+        '''
+        best = sorted(self.best, key=lambda item: item[:2], reverse=True)
+        self.best = []
+        if self.mode == 'top':
+            for precision, index, name, params, y_test, y_score in best:
+                self.plot(count, -index, name, params, y_test, y_score)
+        elif self.mode == 'combined' and best:
+            curves = [('{} {}'.format(-index, name), y_test, y_score)
+                      for precision, index, name, params, y_test, y_score in best]
+            title = 'top {} models of split {}'.format(len(curves), count)
+            pr_name = self.matrix_configs['pr_path'] + 'precision_recall_curve_combined_{}{}'.format(count, self.suffix)
+            roc_name = self.matrix_configs['roc_path'] + 'roc_curve_combined_{}{}'.format(count, self.suffix)
+            self.submit(evaluator.plot_combined, curves, title, pr_name, roc_name, 'save')
+
+    def plot(self, count, index, name, params, y_test, y_score):
+        '''
+        Render the curves of one model
+        '''
+        pr_name = self.matrix_configs['pr_path'] + r'''precision_recall_curve_{}_{}_{}{}'''.format(name, count, index, self.suffix)
+        roc_name = self.matrix_configs['roc_path'] + r'''roc_curve__{}_{}_{}{}'''.format(name, count, index, self.suffix)
+        self.submit(plot_model, y_test, y_score, name, params, pr_name, roc_name)
+
+    def submit(self, function, *args):
+        '''
+        Run a plotting function in the pool, or here without a pool
+        '''
+        if self.pool is None:
+            function(*args)
+            return
+        # bound the scores waiting in the pool
+        while len(self.pending) >= PENDING_PER_WORKER * self.workers:
+            self._collect(self.pending.pop(0))
+        self.pending.append(self.pool.submit(function, *args))
+
+    def _collect(self, future):
+        '''
+        Wait for a plot, a failed plot is logged and does not stop the run
+        '''
+        try:
+            future.result()
+        except Exception as error:
+            logger.warning('plot failed: {}'.format(error))
+
+    def close(self):
+        '''
+        Wait for the remaining plots and stop the pool
+        '''
+        for future in self.pending:
+            self._collect(future)
+        self.pending = []
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
@@ -0,0 +1,129 @@
+'''
+Store of the result rows, one row per (split, model config), appended as
+the fits finish so that an interrupted run can resume where it stopped
+'''
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import sys
+import os
+from pipeline import model_factory
+
+logger = logging.getLogger('result store')
+ch = logging.StreamHandler(sys.stdout)
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+logger.setLevel(logging.INFO)
+
+
+def make_key(split_info, feature_configs, name, model):
+    '''
+    Hash the identity of one fit
+    Inputs:
+        split_info: json serializable boundaries of the split
+        feature_configs: json serializable columns and transform configs
+        name: model's name
+        model: model obj
+    Returns: hex digest identifying the fit
+    '''
+    identity = {'split': split_info,
+                'features': feature_configs,
+                'model': name,
+                'params': model_factory.canonical_params(model)}
+    text = json.dumps(identity, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class result_store():
+
+    '''
+    The class keeps every finished result row in a json lines file,
+    each row is flushed to disk as soon as it is computed
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.records = {}
+        self.torn_tail = False
+        if os.path.exists(path):
+            self.load()
+
+    def load(self):
+        '''
+        Read the rows written by earlier runs, a row cut by a crash is
+        ignored and its model is fitted again
+        '''
+        with open(self.path, 'rb') as store_file:
+            store_file.seek(0, os.SEEK_END)
+            if store_file.tell() > 0:
+                store_file.seek(-1, os.SEEK_END)
+                self.torn_tail = store_file.read(1) != b'\n'
+        with open(self.path) as store_file:
+            for line in store_file:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    logger.warning('skip a truncated row in {}'.format(self.path))
+                    continue
+                self.records[row['key']] = row['record']
+        logger.info('{} finished fits in {}'.format(len(self.records), self.path))
+
+    def __contains__(self, key):
+        return key in self.records
+
+    def get(self, key):
+        '''
+        Get the stored result row of one fit
+        '''
+        return self.records[key]
+
+    def append(self, key, split_info, record):
+        '''
+        Write one result row to the end of the store
+        Inputs:
+            key: make_key of the fit
+            split_info: boundaries of the split, kept for reading the file
+            record: the result row
+        '''
+        record = [value.item() if hasattr(value, 'item') else value for value in record]
+        row = {'key': key, 'split': split_info, 'record': record}
+        line = json.dumps(row, default=str) + '\n'
+        # end a row cut by a crash so it never merges with this one
+        if self.torn_tail:
+            line = '\n' + line
+            self.torn_tail = False
+        with open(self.path, 'a') as store_file:
+            store_file.write(line)
+            store_file.flush()
+            os.fsync(store_file.fileno())
+        self.records[key] = record
+
+    def upsert(self, rows):
+        '''
+        Replace the stored rows of some fits and add the others, the file
+        is rewritten once with a single row per fit
+        Inputs:
+            rows: list of (key, split_info, record)
+        '''
+        kept = OrderedDict()
+        if os.path.exists(self.path):
+            with open(self.path) as store_file:
+                for line in store_file:
+                    try:
+                        row = json.loads(line)
+                    except ValueError:
+                        continue
+                    # the last row of a fit is the one loaded
+                    kept[row['key']] = row
+        for key, split_info, record in rows:
+            record = [value.item() if hasattr(value, 'item') else value for value in record]
+            kept[key] = {'key': key, 'split': split_info, 'record': record}
+            self.records[key] = record
+        with open(self.path + '.tmp', 'w') as store_file:
+            store_file.writelines(json.dumps(row, default=str) + '\n' for row in kept.values())
+            store_file.flush()
+            os.fsync(store_file.fileno())
+        os.rename(self.path + '.tmp', self.path)
+        self.torn_tail = False
@@ -0,0 +1,152 @@
+'''
+Store of the test scores of every fit with the labels and row ids of its
+split, so that the metrics and the curves can be computed again without
+fitting the models
+'''
+import hashlib
+import json
+import logging
+import sys
+import os
+import numpy as np
+
+logger = logging.getLogger('score store')
+ch = logging.StreamHandler(sys.stdout)
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+logger.setLevel(logging.INFO)
+
+# one json line per stored score vector, written after the vector
+INDEX = 'index.jsonl'
+
+
+def split_name(split_info):
+    '''
+    Name of the files of a split, from its boundaries rather than its
+    number, which changes with the time section of the config
+    '''
+    text = json.dumps(split_info, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def _save(path, array):
+    '''
+    Write an array under its final name only once it is complete
+    '''
+    with open(path + '.tmp', 'wb') as array_file:
+        np.save(array_file, array)
+    os.rename(path + '.tmp', path)
+
+
+class score_store():
+
+    '''
+    The class keeps a .npy file per score vector and per split for the
+    labels and the row ids of the test set, and an index of the vectors
+    '''
+
+    def __init__(self, directory):
+        '''
+        Inputs:
+            directory: the directory of the store
+        '''
+        self.directory = directory
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self.entries = {}
+        self.torn_tail = False
+        index_path = os.path.join(directory, INDEX)
+        if os.path.exists(index_path):
+            with open(index_path, 'rb') as index_file:
+                index_file.seek(0, os.SEEK_END)
+                if index_file.tell() > 0:
+                    index_file.seek(-1, os.SEEK_END)
+                    self.torn_tail = index_file.read(1) != b'\n'
+            with open(index_path) as index_file:
+                for line in index_file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.entries[entry['key']] = entry
+
+    def put_split(self, split_info, y_test, row_ids, train_rows=None):
+        '''
+        Keep the labels and the row ids of the test set of a split
+        Inputs:
+            split_info: boundaries of the split
+            y_test: true y
+            row_ids: index of the test rows in the loaded data
+            train_rows: number of training rows of the split
+        '''
+        name = split_name(split_info)
+        _save(os.path.join(self.directory, 'labels_{}.npy'.format(name)),
+              np.asarray(y_test, dtype=np.int8))
+        _save(os.path.join(self.directory, 'row_ids_{}.npy'.format(name)), np.asarray(row_ids))
+        if train_rows is not None:
+            _save(os.path.join(self.directory, 'train_rows_{}.npy'.format(name)),
+                  np.asarray(train_rows, dtype=np.int64))
+
+    def put(self, key, count, split_info, index, name, params, scores, tail):
+        '''
+        Keep the scores of one fit
+        Inputs:
+            key: result_store.make_key of the fit
+            count: number of the split
+            split_info: boundaries of the split
+            index: row of the fit in the results of the split
+            name: model's name
+            params: parameters of the model as string
+            scores: the test scores
+            tail: the values of the result row after the metrics
+        '''
+        _save(os.path.join(self.directory, key + '.npy'), np.asarray(scores))
+        tail = [value.item() if hasattr(value, 'item') else value for value in tail]
+        entry = {'key': key, 'split': count, 'split_info': split_info, 'index': index,
+                 'name': name, 'params': params, 'tail': tail}
+        line = json.dumps(entry, default=str) + '\n'
+        # end a line cut by a crash so it never merges with this one
+        if self.torn_tail:
+            line = '\n' + line
+            self.torn_tail = False
+        with open(os.path.join(self.directory, INDEX), 'a') as index_file:
+            index_file.write(line)
+        self.entries[key] = entry
+
+    def get_split(self, split_info):
+        '''
+        Labels and row ids of the test set of a split
+        Returns: y_test, row ids, None when the split is not stored
+        '''
+        name = split_name(split_info)
+        path = os.path.join(self.directory, 'labels_{}.npy'.format(name))
+        if not os.path.exists(path):
+            return None
+        return (np.load(path),
+                np.load(os.path.join(self.directory, 'row_ids_{}.npy'.format(name)),
+                        allow_pickle=True))
+
+    def train_rows(self, split_info):
+        '''
+        Number of training rows of a split
+        Returns: int, None when the split was stored without it
+        '''
+        path = os.path.join(self.directory, 'train_rows_{}.npy'.format(split_name(split_info)))
+        if not os.path.exists(path):
+            return None
+        return int(np.load(path))
+
+    def fits(self, split_info):
+        '''
+        Index entries of the fits of a split, by key
+        '''
+        name = split_name(split_info)
+        return dict((key, entry) for key, entry in self.entries.items()
+                    if split_name(entry['split_info']) == name)
+
+    def get(self, key):
+        '''
+        Memory map the scores of one fit
+        '''
+        return np.load(os.path.join(self.directory, key + '.npy'), mmap_mode='r')
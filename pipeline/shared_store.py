@@ -0,0 +1,153 @@
+'''
+Memory-mapped store for the matrices of one train/test split, so that the
+worker processes fitting the models attach to the same pages instead of
+receiving their own pickled copy
+'''
+import numpy as np
+from scipy import sparse
+import logging
+import shutil
+import sys
+import os
+import tempfile
+
+logger = logging.getLogger('shared store')
+ch = logging.StreamHandler(sys.stdout)
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+logger.setLevel(logging.INFO)
+
+# components of a stored csr matrix
+SPARSE_PARTS = ('data', 'indices', 'indptr', 'shape')
+SPARSE_EXT = '.csr'
+
+# RAM backed file system when the platform has one
+SHARED_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+
+class matrix_store():
+
+    '''
+    The class keeps named arrays in .npy files under a private directory,
+    readers attach to them by name with a read-only memory map
+    '''
+
+    def __init__(self, directory=SHARED_DIR, keep=False):
+        '''
+        Inputs:
+            directory: parent of the private directory, or with keep the
+                       directory of the store itself
+            keep: leave the files on disk when the store is closed
+        '''
+        self.keep = keep
+        if keep:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            self.directory = directory
+        else:
+            self.directory = tempfile.mkdtemp(prefix='split_', dir=directory)
+        self.handles = {}
+
+    def put(self, name, data, dtype=None, order='C'):
+        '''
+        Write one matrix or vector into the store
+        Inputs:
+            name: the name the readers attach to
+            data: dataframe, series, numpy array or scipy sparse matrix
+            dtype: convert the data to this type before writing
+            order: 'C' to store rows or 'F' to store columns contiguously,
+                   sparse matrices are always stored as csr
+        Returns: the path of the stored array
+        '''
+        if sparse.issparse(data):
+            return self.put_sparse(name, data, dtype)
+        array = np.asarray(getattr(data, 'values', data), dtype=dtype, order=order)
+        path = os.path.join(self.directory, '{}.npy'.format(name))
+        np.save(path, array)
+        self.handles[name] = path
+        logger.info('stored {} with shape {} in {}'.format(name, array.shape, path))
+        return path
+
+    def put_sparse(self, name, data, dtype=None):
+        '''
+        Write the components of a sparse matrix into a directory
+        Inputs:
+            name: the name the readers attach to
+            data: scipy sparse matrix
+            dtype: convert the values to this type before writing
+        Returns: the path of the stored matrix
+        '''
+        matrix = sparse.csr_matrix(data, dtype=dtype)
+        path = os.path.join(self.directory, name + SPARSE_EXT)
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        for part in SPARSE_PARTS:
+            np.save(os.path.join(path, part + '.npy'), np.asarray(getattr(matrix, part)))
+        self.handles[name] = path
+        logger.info('stored sparse {} with shape {} and {} values in {}'.format(
+            name, matrix.shape, matrix.nnz, path))
+        return path
+
+    def get(self, name):
+        '''
+        Attach to one stored array
+        Inputs:
+            name: the name used in put
+        Returns: read-only memory mapped numpy array
+        '''
+        return attach(self.handles[name])
+
+    def close(self):
+        '''
+        Remove the stored files unless the store is kept
+        '''
+        if not self.keep:
+            shutil.rmtree(self.directory, ignore_errors=True)
+        self.handles = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_store(directory):
+    '''
+    Open a kept store written by an earlier run
+    Inputs:
+        directory: the directory of the store
+    Returns: matrix_store with a handle for every stored array
+    '''
+    store = matrix_store(directory, keep=True)
+    for file_name in sorted(os.listdir(directory)):
+        name, ext = os.path.splitext(file_name)
+        if ext in ('.npy', SPARSE_EXT):
+            store.handles[name] = os.path.join(directory, file_name)
+    return store
+
+
+def attach(path):
+    '''
+    Memory map a stored array without copying it
+    Inputs:
+        path: path returned by matrix_store.put
+    Returns: read-only numpy array or scipy csr matrix
+    '''
+    if path.endswith(SPARSE_EXT):
+        parts = {part: np.load(os.path.join(path, part + '.npy'), mmap_mode='r')
+                 for part in SPARSE_PARTS}
+        return sparse.csr_matrix((parts['data'], parts['indices'], parts['indptr']),
+                                 shape=tuple(parts['shape']), copy=False)
+    return np.load(path, mmap_mode='r')
+
+
+def attach_all(handles):
+    '''
+    Memory map every array of a store
+    Inputs:
+        handles: dictionary of name to path, matrix_store.handles
+    Returns: dictionary of name to read-only numpy array
+    '''
+    return {name: attach(path) for name, path in handles.items()}
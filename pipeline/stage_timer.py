@@ -0,0 +1,71 @@
+'''
+Structured log of the time spent in every stage of a run, one json line
+per stage and split
+'''
+from contextlib import contextmanager
+import json
+import logging
+import sys
+import time
+
+logger = logging.getLogger('stage timer')
+ch = logging.StreamHandler(sys.stdout)
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+logger.setLevel(logging.INFO)
+
+
+class stage_timer():
+
+    '''
+    The class appends the timing of every stage to a json lines file,
+    the stages of a split are added up and written with end_split
+    '''
+
+    def __init__(self, path):
+        '''
+        Inputs:
+            path: the json lines file
+        '''
+        self.path = path
+        self.run_start = time.time()
+        self.totals = {}
+
+    @contextmanager
+    def stage(self, name):
+        '''
+        Time a block as part of the stage name of the current split
+        '''
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add(name, time.time() - start)
+
+    def add(self, name, seconds):
+        '''
+        Add seconds to the stage name of the current split
+        '''
+        self.totals[name] = self.totals.get(name, 0.0) + seconds
+
+    def end_split(self, split):
+        '''
+        Write the stages of a split and start the next one
+        Inputs:
+            split: number of the split, 0 for the stages before the splits
+        '''
+        with open(self.path, 'a') as log_file:
+            for name, seconds in self.totals.items():
+                log_file.write(json.dumps({'time': time.time(), 'split': split,
+                                           'stage': name, 'seconds': seconds}) + '\n')
+        logger.info('split {} stages: {}'.format(split, ', '.join(
+            '{} {:.2f}s'.format(name, seconds) for name, seconds in self.totals.items())))
+        self.totals = {}
+
+    def end_run(self):
+        '''
+        Write the total time of the run
+        '''
+        self.add('total', time.time() - self.run_start)
+        self.end_split(None)
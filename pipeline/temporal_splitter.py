@@ -0,0 +1,84 @@
+'''
+Temporal train/test splits over a data set sorted once by year
+'''
+import numpy as np
+import logging
+import sys
+
+logger = logging.getLogger('temporal splitter')
+ch = logging.StreamHandler(sys.stdout)
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+logger.setLevel(logging.INFO)
+
+
+class temporal_splitter():
+
+    '''
+    The class sorts the rows by year once, every split is then a range of
+    the sorted rows: the training set is every year up to train_end, the
+    test set is test_period years starting gap + 1 years after train_end,
+    and train_end moves forward by update_period years
+    '''
+
+    def __init__(self, time_config):
+        '''
+        Inputs:
+            time_config: start_year, end_year, update_period, test_period,
+                         optional gap (default 2, the years between the last
+                         training year and the first test year the labels
+                         need) and min_train_period (default 2)
+        '''
+        self.start_year = time_config['start_year']
+        self.end_year = time_config['end_year']
+        self.update_period = time_config.get('update_period', 2)
+        self.test_period = time_config.get('test_period', 2)
+        self.gap = time_config.get('gap', 2)
+        self.min_train_period = time_config.get('min_train_period', 2)
+        self.sorted_years = None
+
+    def split_info(self):
+        '''
+        Boundaries of every split
+        Returns: list of dictionaries with the last train year and the test years
+        '''
+        infos = []
+        train_end = self.start_year + self.min_train_period - 1
+        while train_end + self.gap + self.test_period <= self.end_year:
+            test_start = train_end + self.gap + 1
+            infos.append({'train_end': train_end,
+                          'test_years': list(range(test_start, test_start + self.test_period))})
+            train_end += self.update_period
+        return infos
+
+    def fit(self, years):
+        '''
+        Sort the rows by year
+        Inputs:
+            years: the time column
+        Returns: the positions of the rows in sorted order, stable within a year
+        '''
+        years = np.asarray(years)
+        order = np.argsort(years, kind='mergesort')
+        self.sorted_years = years[order]
+        return order
+
+    def splits(self):
+        '''
+        Ranges of the sorted rows for every split, after fit
+        Returns: list of dictionaries, split_info with 'train' and 'test'
+                 (start, stop) positions of the sorted rows
+        '''
+        splits = []
+        for info in self.split_info():
+            train_stop = np.searchsorted(self.sorted_years, info['train_end'], side='right')
+            test_start = np.searchsorted(self.sorted_years, info['test_years'][0], side='left')
+            test_stop = np.searchsorted(self.sorted_years, info['test_years'][-1], side='right')
+            split = dict(info)
+            split['train'] = (0, int(train_stop))
+            split['test'] = (int(test_start), int(test_stop))
+            logger.info('split {}: train rows {}, test rows {}'.format(
+                info, split['train'], split['test']))
+            splits.append(split)
+        return splits
@@ -0,0 +1,123 @@
+'''
+Content addressed on-disk cache of the transformed matrices of every split
+'''
+import hashlib
+import json
+import logging
+import shutil
+import sys
+import os
+from pipeline import shared_store
+
+logger = logging.getLogger('transform cache')
+ch = logging.StreamHandler(sys.stdout)
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+logger.setLevel(logging.INFO)
+
+# written last, an entry without it is incomplete
+MANIFEST = 'manifest.json'
+CHUNK_SIZE = 1 << 20
+
+
+def fingerprint_file(path):
+    '''
+    Hash the content of a file
+    Inputs:
+        path: path of the file
+    Returns: hex digest of the content
+    '''
+    digest = hashlib.sha1()
+    with open(path, 'rb') as data_file:
+        for chunk in iter(lambda: data_file.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class transform_cache():
+
+    '''
+    The class maps (input data, feature configs, split) to a directory of
+    column-major .npy files which are memory mapped on a hit
+    '''
+
+    def __init__(self, cache_dir, input_path, feature_configs):
+        '''
+        Inputs:
+            cache_dir: root directory of the cache
+            input_path: the data set the splits are cut from
+            feature_configs: json serializable columns and transform configs
+        '''
+        self.cache_dir = cache_dir
+        self.fingerprint = fingerprint_file(input_path)
+        self.feature_configs = feature_configs
+
+    def entry(self, split_info):
+        '''
+        Directory of the cached matrices of one split
+        Inputs:
+            split_info: json serializable boundaries of the split
+        Returns: path of the entry
+        '''
+        identity = {'data': self.fingerprint,
+                    'features': self.feature_configs,
+                    'split': split_info}
+        text = json.dumps(identity, sort_keys=True, default=str)
+        return os.path.join(self.cache_dir, hashlib.sha1(text.encode('utf-8')).hexdigest())
+
+    def load(self, split_info):
+        '''
+        Look up the matrices of one split
+        Inputs:
+            split_info: boundaries of the split
+        Returns: kept shared_store.matrix_store, None on a miss or when
+                 the manifest or an array of the entry is damaged
+        '''
+        directory = self.entry(split_info)
+        path = os.path.join(directory, MANIFEST)
+        if not os.path.exists(path):
+            logger.info('cache miss for split {}'.format(split_info))
+            return None
+        try:
+            with open(path) as manifest_file:
+                manifest = json.load(manifest_file)
+            store = shared_store.open_store(directory)
+            missing = set(manifest['arrays']) - set(store.handles)
+            if missing:
+                raise ValueError('missing arrays {}'.format(sorted(missing)))
+            # a truncated array cannot be mapped
+            for name in manifest['arrays']:
+                store.get(name)
+        except (ValueError, KeyError, TypeError, OSError) as error:
+            logger.warning('invalid cache entry for split {}, transforming it again: {}'.format(
+                split_info, error))
+            return None
+        logger.info('cache hit for split {} in {}'.format(split_info, directory))
+        return store
+
+    def create(self, split_info):
+        '''
+        Start a new entry, the arrays are added with put of the store
+        Inputs:
+            split_info: boundaries of the split
+        Returns: kept shared_store.matrix_store to write the arrays in
+        '''
+        directory = self.entry(split_info)
+        # drop what an interrupted run left behind
+        shutil.rmtree(directory, ignore_errors=True)
+        return shared_store.matrix_store(directory, keep=True)
+
+    def commit(self, store, columns):
+        '''
+        Mark an entry complete once every array is written
+        Inputs:
+            store: the store returned by create
+            columns: names of the feature columns
+        '''
+        manifest = {'columns': [str(col) for col in columns],
+                    'arrays': sorted(store.handles)}
+        path = os.path.join(store.directory, MANIFEST)
+        with open(path + '.tmp', 'w') as manifest_file:
+            json.dump(manifest, manifest_file)
+        os.rename(path + '.tmp', path)
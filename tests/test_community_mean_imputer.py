@@ -0,0 +1,56 @@
+'''
+test code for the community_mean_imputer.py
+'''
+import unittest
+import numpy as np
+import pandas as pd
+from pipeline.community_mean_imputer import community_mean_imputer
+
+TRAIN = pd.DataFrame({'ward': [1, 1, 1, 2, 2, 1],
+                      'year': [2010, 2010, 2010, 2010, 2010, 2011],
+                      'rate': [1.0, 3.0, np.nan, 10.0, np.nan, 5.0]})
+
+class TestCommunityMeanImputer(unittest.TestCase):
+    '''
+    unit test for the regional mean imputation
+
+    '''
+    def setUp(self):
+        self.imputer = community_mean_imputer()
+        self.train = self.imputer.train_regional_mean(TRAIN.copy(), 'ward', 'year')
+
+    def test_train(self):
+        self.assertEqual(list(self.train['rate']), [1.0, 3.0, 2.0, 10.0, 10.0, 5.0])
+        self.assertEqual(self.imputer.trained_imp.loc[(1, 2011), 'rate'], 5.0)
+
+    def test_empty_group(self):
+        # ward 3 has no value in 2010, its row takes the global mean
+        train = pd.concat(
+            [TRAIN, pd.DataFrame({'ward': [3], 'year': [2010], 'rate': [np.nan]})],
+            ignore_index=True)
+        filled = community_mean_imputer().train_regional_mean(train.copy(), 'ward', 'year')
+        self.assertEqual(filled['rate'].iloc[-1], 4.75)
+        filled = community_mean_imputer().partial_fit(train.copy(), 'ward', 'year')
+        self.assertEqual(filled['rate'].iloc[-1], 4.75)
+
+    def test_exact_lookup(self):
+        test = pd.DataFrame({'ward': [1, 2], 'year': [2014, 2014], 'rate': [np.nan, np.nan]})
+        test = self.imputer.transform_test(test, 'ward', 'year', lag=4)
+        self.assertEqual(list(test['rate']), [2.0, 10.0])
+
+    def test_nearest_fallback(self):
+        # ward 2 has no 2011 mean, unseen ward 3 takes the global mean
+        test = pd.DataFrame({'ward': [1, 2, 3], 'year': [2015, 2015, 2015],
+                             'rate': [np.nan, np.nan, np.nan]})
+        test = self.imputer.transform_test(test, 'ward', 'year', lag=4)
+        self.assertEqual(list(test['rate']), [5.0, 10.0, 4.75])
+
+    def test_global_and_none_fallback(self):
+        test = pd.DataFrame({'ward': [2, 2], 'year': [2015, 2014], 'rate': [np.nan, 7.0]})
+        filled = self.imputer.transform_test(test.copy(), 'ward', 'year', lag=4, fallback='global')
+        self.assertEqual(list(filled['rate']), [4.75, 7.0])
+        left = self.imputer.transform_test(test.copy(), 'ward', 'year', lag=4, fallback='none')
+        self.assertTrue(np.isnan(left['rate'].iloc[0]))
+
+if __name__ == '__main__':
+    unittest.main()
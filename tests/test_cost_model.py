@@ -0,0 +1,75 @@
+'''
+test code for the cost_model.py
+'''
+import unittest
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.naive_bayes import GaussianNB
+from pipeline import cost_model
+from pipeline import model_factory
+
+class TestCostModel(unittest.TestCase):
+    '''
+    unit test for the projection and the scheduling of the fits
+
+    '''
+    def test_makespan_longest_first(self):
+        self.assertEqual(cost_model.makespan([1, 1, 1, 3], 2), 3)
+        self.assertEqual(cost_model.makespan([2, 2, 2], 1), 6)
+
+    def test_projection_bounds(self):
+        calibration = {'rows': [500, 1000], 'seconds': [1.0, 8.0], 'peak': 100, 'scale': 2.0}
+        seconds, peak = cost_model.project(calibration, 2000)
+        # the growth is capped at quadratic
+        self.assertAlmostEqual(seconds, 8.0 * 4 * 2)
+        self.assertAlmostEqual(peak, 400)
+
+    def test_big_forest_scheduled_first(self):
+        models = [('GaussianNB', GaussianNB()),
+                  ('RandomForestClassifier', RandomForestClassifier(n_estimators=10, max_depth=5)),
+                  ('RandomForestClassifier', RandomForestClassifier(n_estimators=10000, max_depth=50))]
+        jobs = model_factory.schedule(model_factory.plan_jobs(models, grouped=False))
+        self.assertEqual([job[2][0][0] for job in jobs], [2, 1, 0])
+
+    def test_budget_downgrades_and_skips(self):
+        models = [('GaussianNB', GaussianNB()),
+                  ('RandomForestClassifier', RandomForestClassifier(n_estimators=10, max_depth=5)),
+                  ('RandomForestClassifier', RandomForestClassifier(n_estimators=10000, max_depth=50))]
+        # 10000 trees of up to 2 * 1000 - 1 nodes of NODE_BYTES
+        self.assertEqual(cost_model.model_size(*models[2], 1000), 10000 * 1999 * 80)
+        self.assertEqual(cost_model.model_size(*models[1], 1000), 10 * 63 * 80)
+        self.assertEqual(cost_model.model_size(*models[0], 1000), 0)
+        # leaves of at least 5 rows, at most 200 of them
+        leafy = RandomForestClassifier(n_estimators=10, min_samples_leaf=5)
+        self.assertEqual(cost_model.model_size('RandomForestClassifier', leafy, 1000), 10 * 399 * 80)
+        leafy.set_params(min_samples_leaf=0.01, max_leaf_nodes=50)
+        self.assertEqual(cost_model.model_size('RandomForestClassifier', leafy, 1000), 10 * 99 * 80)
+        split = RandomForestClassifier(n_estimators=10, min_samples_split=999)
+        self.assertEqual(cost_model.model_size('RandomForestClassifier', split, 1000), 10 * 5 * 80)
+        memory = {'budget_mb': 100}
+        kept = cost_model.fit_budget(models, 1000, memory)
+        self.assertEqual(kept[:2], models[:2])
+        self.assertEqual(kept[2][1].n_estimators, 655)
+        self.assertEqual(models[2][1].n_estimators, 10000)
+        memory['oversize'] = 'skip'
+        self.assertEqual(cost_model.fit_budget(models, 1000, memory), models[:2])
+        memory['oversize'] = 'run'
+        self.assertEqual(cost_model.fit_budget(models, 1000, memory), models)
+
+    def test_dry_run_within_the_budget(self):
+        rng = np.random.RandomState(0)
+        X_train, y_train, X_test = rng.rand(300, 3), rng.randint(2, size=300), rng.rand(50, 3)
+        models = [('GaussianNB', GaussianNB()),
+                  ('RandomForestClassifier', RandomForestClassifier(n_estimators=20, random_state=0))]
+        # 20 trees of 2 * 1000 - 1 nodes fit on 1000 rows, 9 of 2 * 2000 - 1 on 2000 rows
+        memory = {'budget_mb': 20 * 1999 * 80 / 2.0 ** 20}
+        costs, wall_clock = cost_model.dry_run(models, X_train, y_train, X_test, [1000, 2000],
+                                               memory=memory)
+        self.assertEqual(costs['models'].sum(), 4)
+        forests = costs[costs['model_name'] == 'RandomForestClassifier']
+        self.assertIn('n_estimators=20', forests['parameters'].iloc[0])
+        self.assertIn('n_estimators=9', forests['parameters'].iloc[1])
+        self.assertGreater(wall_clock, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+'''
+test code for the evaluator.py
+'''
+import unittest
+import numpy as np
+from sklearn.metrics import accuracy_score
+from sklearn.metrics import precision_score
+from sklearn.metrics import recall_score
+from sklearn.metrics import f1_score
+from sklearn.metrics import roc_auc_score
+from sklearn.metrics import precision_recall_curve
+from pipeline import evaluator
+
+THRESHOLDS = [1, 2, 5, 10, 20, 30, 50, 100]
+
+class TestEvaluator(unittest.TestCase):
+    '''
+    unit test for the vectorized metrics
+
+    '''
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.y_scores = rng.rand(1000)
+        self.y_true = (rng.rand(1000) < self.y_scores).astype(int)
+
+    def expected(self, k):
+        y_scores_sorted, y_true_sorted = evaluator.joint_sort_descending(
+            self.y_scores, self.y_true)
+        preds_at_k = evaluator.generate_binary_at_k(y_scores_sorted, k)
+        return {'precision': precision_score(y_true_sorted, preds_at_k),
+                'recall': recall_score(y_true_sorted, preds_at_k),
+                'accuracy': accuracy_score(y_true_sorted, preds_at_k),
+                'f1': f1_score(y_true_sorted, preds_at_k),
+                'auc_roc': roc_auc_score(y_true_sorted, preds_at_k)}
+
+    def test_metrics_match_sklearn(self):
+        metrics = evaluator.metrics_at_k(self.y_true, self.y_scores, THRESHOLDS)
+        for i, k in enumerate(THRESHOLDS):
+            for key, value in self.expected(k).items():
+                self.assertAlmostEqual(metrics[key][i], value, msg='{} at {}'.format(key, k))
+
+    def test_single_threshold_wrappers(self):
+        expected = self.expected(30)
+        self.assertAlmostEqual(evaluator.precision_at_k(self.y_true, self.y_scores, 30), expected['precision'])
+        self.assertAlmostEqual(evaluator.recall_at_k(self.y_true, self.y_scores, 30), expected['recall'])
+        self.assertAlmostEqual(evaluator.compute_acc(self.y_true, self.y_scores, 30), expected['accuracy'])
+        self.assertAlmostEqual(evaluator.compute_f1(self.y_true, self.y_scores, 30), expected['f1'])
+
+    def test_empty_cutoff(self):
+        metrics = evaluator.metrics_at_k(self.y_true, self.y_scores, [0])
+        self.assertEqual(metrics['precision'][0], 0)
+        self.assertEqual(metrics['recall'][0], 0)
+
+    def test_precision_recall_n_curve(self):
+        rng = np.random.RandomState(1)
+        y_true = rng.randint(0, 2, 500)
+        # rounded scores have ties
+        y_score = np.round(rng.rand(500), 2)
+        precision, recall, pct = evaluator.precision_recall_n_curve(y_true, y_score)
+        expected_precision, expected_recall, thresholds = precision_recall_curve(y_true, y_score)
+        np.testing.assert_allclose(precision, expected_precision[:len(thresholds)])
+        np.testing.assert_allclose(recall, expected_recall[:len(thresholds)])
+        np.testing.assert_allclose(pct, [np.mean(y_score >= value) for value in thresholds])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,203 @@
+'''
+test code for the executor.py
+'''
+import unittest
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.ensemble import GradientBoostingClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.svm import LinearSVC
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pipeline import executor
+from pipeline import model_factory
+from pipeline import shared_store
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RSS_SCRIPT = '''
+import sys, tempfile
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from pipeline import executor
+rng = np.random.RandomState(0)
+X, y = rng.rand(5000, 5), rng.randint(2, size=5000)
+memory = {'spill_dir': tempfile.mkdtemp(), 'spill_trees': 10} if sys.argv[1] == 'True' else None
+before = executor.reset_peak_rss()
+executor.fit_and_predict('RandomForestClassifier', RandomForestClassifier(n_estimators=100, random_state=0),
+                         X, y, rng.rand(1000, 5), memory=memory)
+print(executor.peak_rss_mb() - before)
+'''
+
+def make_data(seed=0):
+    rng = np.random.RandomState(seed)
+    X = rng.rand(300, 5)
+    y = (X[:, 0] + rng.rand(300) > 1).astype(int)
+    return X, y, rng.rand(50, 5)
+
+class TestExecutor(unittest.TestCase):
+    '''
+    unit test for the grouped fits of the executor
+
+    '''
+    def check_ladder(self, constructor):
+        X_train, y_train, X_test = make_data()
+        models = [(constructor.__name__, constructor(n_estimators=size, random_state=0))
+                  for size in (20, 5)]
+        jobs = model_factory.plan_jobs([(name, constructor(**model.get_params()))
+                                        for name, model in models])
+        self.assertEqual([job[0] for job in jobs], ['ladder'])
+        results = dict(executor.run_job(*jobs[0], X_train, y_train, X_test))
+        for index, (name, model) in enumerate(models):
+            expected = executor.fit_and_predict(name, model, X_train, y_train, X_test)
+            self.assertEqual(results[index]['params'], expected['params'])
+            np.testing.assert_allclose(results[index]['scores'], expected['scores'])
+            self.assertEqual(sorted(results[index]['stats']), sorted(executor.STAT_COLUMNS))
+            self.assertEqual(results[index]['stats']['train_rows'], 300)
+
+    def test_truncated_forest(self):
+        self.check_ladder(RandomForestClassifier)
+
+    def test_staged_boosting(self):
+        self.check_ladder(GradientBoostingClassifier)
+
+    def test_chunked_scoring(self):
+        X_train, y_train, X_test = make_data()
+        memory = {'budget_mb': 0.0001}
+        models = [('RandomForestClassifier', RandomForestClassifier(n_estimators=20, random_state=0)),
+                  ('GradientBoostingClassifier', GradientBoostingClassifier(n_estimators=20, random_state=0))]
+        for name, model in models:
+            self.assertLess(executor.chunk_rows(model, X_test, memory), X_test.shape[0])
+            expected = executor.fit_and_predict(name, model, X_train, y_train, X_test)
+            chunked = executor.fit_and_predict(name, model, X_train, y_train, X_test, memory=memory)
+            np.testing.assert_array_equal(chunked['scores'], expected['scores'])
+        fitted = GradientBoostingClassifier(n_estimators=20, random_state=0).fit(X_train, y_train)
+        staged = executor.staged_scores(fitted, X_test, [5, 20, 30], 7)
+        np.testing.assert_array_equal(staged[20], fitted.predict_proba(X_test)[:, 1])
+        np.testing.assert_array_equal(staged[30], staged[20])
+
+    def test_spilled_forest(self):
+        X_train, y_train, X_test = make_data()
+        directory = tempfile.mkdtemp()
+        try:
+            memory = {'spill_dir': directory, 'spill_trees': 7}
+            models = [('RandomForestClassifier', RandomForestClassifier(n_estimators=size, random_state=0))
+                      for size in (20, 5)]
+            jobs = model_factory.plan_jobs(models)
+            results = dict(executor.run_job(*jobs[0], X_train, y_train, X_test, memory=memory))
+            for index, (name, model) in enumerate(models):
+                expected = executor.fit_and_predict(name, model, X_train, y_train, X_test)
+                spilled = executor.fit_and_predict(name, model, X_train, y_train, X_test,
+                                                   memory=memory)
+                np.testing.assert_array_equal(spilled['scores'], expected['scores'])
+                np.testing.assert_array_equal(results[index]['scores'], expected['scores'])
+            self.assertEqual(os.listdir(directory), [])
+        finally:
+            shutil.rmtree(directory)
+
+    @unittest.skipIf(not os.path.exists('/proc/self/clear_refs'), 'no peak RSS reset on this platform')
+    def test_spilled_forest_memory(self):
+        # the peak RSS of a process fitting 100 trees on random labels
+        def peak_growth(spilled):
+            return float(subprocess.check_output(
+                [sys.executable, '-c', RSS_SCRIPT, str(spilled)], cwd=ROOT).split()[-1])
+        self.assertLess(peak_growth(True), peak_growth(False) / 2)
+
+    def test_warm_start_needs_the_same_features(self):
+        X_train, y_train, X_test = make_data()
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'state.pkl')
+            features = ['f{}'.format(i) for i in range(5)]
+            model = GradientBoostingClassifier(n_estimators=10, random_state=0)
+            executor.fit_and_predict('GradientBoostingClassifier', model, X_train[:200],
+                                     y_train[:200], X_test, path, features=features)
+            self.assertEqual(executor.load_warm_state(path)[2], features)
+            moved = features[1:] + features[:1]
+            result = executor.fit_and_predict('GradientBoostingClassifier', model, X_train,
+                                              y_train, X_test, path, features=moved)
+            self.assertEqual(result['fit_mode'], 'cold')
+            result = executor.fit_and_predict('GradientBoostingClassifier', model, np.vstack(
+                [X_train, X_train]), np.hstack([y_train, y_train]), X_test, path, features=moved)
+            self.assertEqual(result['fit_mode'], 'warm')
+        finally:
+            shutil.rmtree(directory)
+
+    def test_regularization_path(self):
+        X_train, y_train, X_test = make_data()
+        # an l1 grid of the config is fitted with saga, along the path too
+        for penalty in ('l2', 'l1'):
+            models = list(model_factory.get_models(
+                {'LogisticRegression': {'penalty': [penalty], 'C': [10, 0.01, 1], 'random_state': [0]}}))
+            jobs = model_factory.plan_jobs(models)
+            self.assertEqual([job[0] for job in jobs], ['path'])
+            results = dict(executor.run_job(*jobs[0], X_train, y_train, X_test))
+            for index, (name, model) in enumerate(models):
+                self.assertFalse(model.warm_start)
+                expected = executor.fit_and_predict(name, model, X_train, y_train, X_test)
+                self.assertEqual(results[index]['params'], expected['params'])
+                np.testing.assert_allclose(results[index]['scores'], expected['scores'], atol=1e-2)
+
+    def test_warm_started_models_fit_alone(self):
+        models = [('LogisticRegression', LogisticRegression(C=C, solver='lbfgs'))
+                  for C in (0.1, 1)] + [('KNeighborsClassifier', KNeighborsClassifier(n_neighbors=k))
+                                        for k in (1, 5)]
+        jobs = model_factory.plan_jobs(models, [False, False, True, True])
+        self.assertEqual([job[0] for job in jobs], ['single', 'single', 'neighbors'])
+
+    def test_liblinear_fits_alone(self):
+        models = [('LogisticRegression', LogisticRegression(C=C, solver='liblinear'))
+                  for C in (0.1, 1)] + [('LinearSVC', LinearSVC(C=C)) for C in (0.1, 1, 10)]
+        with self.assertLogs('generating models') as logs:
+            jobs = model_factory.plan_jobs(models)
+        self.assertEqual([job[0] for job in jobs], ['single'] * 5)
+        self.assertEqual(len(logs.output), 2)
+        self.assertIn('3 LinearSVC models only differing by C', logs.output[1])
+
+    def test_one_neighbor_query(self):
+        X_train, y_train, X_test = make_data()
+        # a test row on a training row has a zero distance
+        X_test = np.vstack([X_test, X_train[:5]])
+        models = [('KNeighborsClassifier', KNeighborsClassifier(n_neighbors=k, weights=weights))
+                  for k in (1, 5) for weights in ('uniform', 'distance')]
+        jobs = model_factory.plan_jobs(models)
+        self.assertEqual([job[0] for job in jobs], ['neighbors'])
+        results = dict(executor.run_job(*jobs[0], X_train, y_train, X_test))
+        for index, (name, model) in enumerate(models):
+            expected = executor.fit_and_predict(name, model, X_train, y_train, X_test)
+            np.testing.assert_allclose(results[index]['scores'], expected['scores'])
+
+    def test_pool_matches_serial_run(self):
+        X_train, y_train, X_test = make_data()
+        models = [('RandomForestClassifier', RandomForestClassifier(n_estimators=10, n_jobs=2, random_state=0)),
+                  ('LogisticRegression', LogisticRegression(C=1, n_jobs=2)),
+                  ('GradientBoostingClassifier', GradientBoostingClassifier(n_estimators=5, random_state=0))]
+        with shared_store.matrix_store() as store:
+            store.put('X_train', X_train)
+            store.put('y_train', y_train)
+            store.put('X_test', X_test)
+            serial = list(executor.run_models(models, store.handles, workers=1))
+            pooled = list(executor.run_models(models, store.handles, workers=2))
+        self.assertEqual([index for index, _ in pooled], [0, 1, 2])
+        for (_, expected), (_, result) in zip(serial, pooled):
+            self.assertEqual(result['params'], expected['params'])
+            np.testing.assert_allclose(result['scores'], expected['scores'])
+        self.assertIn('n_jobs=2', pooled[0][1]['params'])
+        self.assertEqual(models[0][1].n_jobs, 2)
+
+    @unittest.skipIf(not os.path.exists('/proc/self/clear_refs'), 'no peak RSS reset on this platform')
+    def test_peak_rss_of_every_fit(self):
+        # the second fit stays under the peak of the first, it still has its own
+        rng = np.random.RandomState(0)
+        X, y = rng.rand(5000, 5), rng.randint(2, size=5000)
+        deltas = [executor.fit_and_predict('RandomForestClassifier', RandomForestClassifier(
+            n_estimators=50, random_state=0), X, y, X[:100])['stats']['peak_rss_delta_mb']
+                  for _ in range(2)]
+        self.assertGreater(min(deltas), 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+'''
+test code for the get_dummy.py
+'''
+import os
+import pickle
+import tempfile
+import unittest
+import pandas as pd
+from pipeline import get_dummy
+
+TRAIN = pd.DataFrame({'ward': [1, 1, 1, 2, 2, 3], 'rate': [0.1, 0.2, 0.3, 0.4, 0.5, 0.6]})
+TEST = pd.DataFrame({'ward': [3, 2, 4, 1], 'rate': [0.1, 0.2, 0.3, 0.4]})
+
+class TestGetDummy(unittest.TestCase):
+    '''
+    unit test for the categorical encoder
+
+    '''
+    def test_top_k_others(self):
+        encoder = get_dummy.top_k_encoder('ward', 2).fit(TRAIN)
+        self.assertEqual(encoder.get_feature_names(), [1, 2, 'ward_others'])
+        self.assertEqual(list(encoder.transform_codes(TEST)), [2, 1, 2, 0])
+
+    def test_all_categories(self):
+        encoder = get_dummy.top_k_encoder('ward', 5).fit(TRAIN)
+        self.assertEqual(list(encoder.transform_codes(TEST)), [2, 1, -1, 0])
+        block = encoder.transform_sparse(TEST).toarray()
+        self.assertEqual(block.sum(axis=1).tolist(), [1, 1, 0, 1])
+
+    def test_dense_matches_sparse(self):
+        X_train, X_test = get_dummy.get_dummies(TRAIN.copy(), TEST.copy(), 'ward', 2)
+        sparse_train, sparse_test = get_dummy.get_sparse_dummies(TRAIN.copy(), TEST.copy(), ['ward'], 2)
+        self.assertEqual(X_train.values.tolist(), sparse_train.toarray().tolist())
+        self.assertEqual(X_test.values.tolist(), sparse_test.toarray().tolist())
+
+    def test_pickle(self):
+        encoder = get_dummy.fit_encoder(TRAIN, 'ward', 2)
+        path = os.path.join(tempfile.mkdtemp(), 'ward.pkl')
+        encoder.save(path)
+        loaded = get_dummy.load_encoder(path)
+        self.assertEqual(list(loaded.transform_codes(TEST)), list(encoder.transform_codes(TEST)))
+        self.assertEqual(pickle.loads(pickle.dumps(encoder)).categories, encoder.categories)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+'''
+test code for the halving_search.py
+'''
+import unittest
+import numpy as np
+from sklearn.dummy import DummyClassifier
+from sklearn.linear_model import LogisticRegression
+from pipeline import halving_search
+from pipeline import shared_store
+
+class TestHalvingSearch(unittest.TestCase):
+    '''
+    unit test for the successive halving search
+
+    '''
+    def test_sample_keeps_classes(self):
+        y = np.array([0] * 90 + [1] * 10)
+        rows = halving_search.sample_rows(y, 20, np.random.RandomState(0))
+        self.assertEqual(len(rows), 20)
+        self.assertEqual(y[rows].sum(), 2)
+
+    def test_selects_informative_model(self):
+        rng = np.random.RandomState(0)
+        X = rng.rand(600, 3)
+        y = (X[:, 0] > 0.7).astype(int)
+        models = [('DummyClassifier', DummyClassifier(strategy='uniform', random_state=0)),
+                  ('LogisticRegression', LogisticRegression())]
+        with shared_store.matrix_store() as store:
+            store.put('X_train', X)
+            store.put('y_train', y)
+            selected, history = halving_search.successive_halving(models, store, {'factor': [3]}, 10)
+        self.assertEqual(selected, [1])
+        self.assertEqual(list(history.columns), halving_search.HISTORY_COLUMNS)
+        self.assertEqual(history['round'].max(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
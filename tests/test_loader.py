@@ -0,0 +1,53 @@
+'''
+test code for the loader.py
+'''
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from pipeline import loader
+
+COLS = {'x_cols': ['rate', 'ward', 'year'], 'y_col': ['license death'], 'time_col': ['year']}
+TRANSFORM = {'imputation': {'cols': ['ward']}, 'dummy': {'cols': ['ward']}}
+
+class TestLoader(unittest.TestCase):
+    '''
+    unit test for the typed columnar loader
+
+    '''
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.input_path = os.path.join(self.directory, 'data.csv')
+        pd.DataFrame({'rate': [0.5, None, 1.5], 'ward': [3, 1, 3], 'unused': ['a', 'b', 'c'],
+                      'year': [2010, 2011, 2012], 'license death': [0, 1, 0]}).to_csv(
+                          self.input_path, index=False)
+        self.io_config = {'input_path': self.input_path,
+                          'columnar_dir': os.path.join(self.directory, 'columnar')}
+
+    def test_typed_projection(self):
+        df = loader.load_dataset({'input_path': self.input_path}, COLS, TRANSFORM)
+        self.assertEqual(list(df.columns), ['rate', 'ward', 'year', 'license death'])
+        self.assertEqual([str(dtype) for dtype in df.dtypes], ['float32', 'category', 'int16', 'int8'])
+        self.assertEqual(list(df['ward'].cat.categories), [1, 3])
+
+    def test_columnar_reload(self):
+        first = loader.load_dataset(self.io_config, COLS, TRANSFORM)
+        second = loader.load_dataset(self.io_config, COLS, TRANSFORM)
+        pd.testing.assert_frame_equal(first, second)
+
+    def test_columns_stay_memory_mapped(self):
+        loader.load_dataset(self.io_config, COLS, TRANSFORM)
+        directory = os.path.join(self.io_config['columnar_dir'],
+                                 os.listdir(self.io_config['columnar_dir'])[0])
+        df = loader.load_columnar(directory)
+        for col in df.columns:
+            base = df[col].values
+            if df[col].dtype == 'category':
+                base = base.codes
+            while base is not None and not isinstance(base, np.memmap):
+                base = base.base
+            self.assertIsInstance(base, np.memmap, col)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,23 +3,111 @@ test code for main function
 '''
 import os, sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from collections import OrderedDict
+import argparse
+import shutil
+import tempfile
 import unittest
+import numpy as np
 import pandas as pd
+import yaml
 import main
-import pdb
+from benchmarks import synthetic
 
-CONFIG_FILE = './acs_geo_basic.yml'
+WARM_MODELS = {'GradientBoostingClassifier': {'n_estimators': [10], 'random_state': [0]},
+               'RandomForestClassifier': {'n_estimators': [10], 'random_state': [0]},
+               'LogisticRegression': {'penalty': ['l2'], 'C': [1]}}
+
+MODELS = {'DecisionTreeClassifier': {'max_depth': [1, 5], 'random_state': [0]},
+          'LogisticRegression': {'penalty': ['l2'], 'C': [0.1, 1]},
+          'GaussianNB': None}
 
 class TestMain(unittest.TestCase):
     '''
-    test the main function using the basic models
+    test the main function using the basic models on synthetic data
     '''
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        input_path = os.path.join(self.directory, 'synthetic.csv')
+        synthetic.generate(0.3).to_csv(input_path, index=False)
+        config = synthetic.make_config(input_path, self.directory, MODELS)
+        config['matrix']['plots'] = ['none']
+        self.config = config
+        self.config_path = os.path.join(self.directory, 'config.yml')
+        with open(self.config_path, 'w') as config_file:
+            yaml.safe_dump(config, config_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
     def test_(self):
-        
-        main.run(CONFIG_FILE)
-        
+        args = argparse.Namespace(config=self.config_path, workers=1, dry_run=False,
+                                  warm_start=False, recompute_metrics=False)
+        main.run(args)
+        n_splits = len(main.split_years(self.config['time']))
+        for count in range(1, n_splits + 1):
+            results = pd.read_csv(self.config['matrix']['out_path'] + '{}.csv'.format(count))
+            self.assertEqual(len(results), 5)
+            self.assertTrue(results['auc_roc'].between(0, 1).all())
+
+    def test_recompute_metrics_of_the_config(self):
+        args = argparse.Namespace(config=self.config_path, workers=1, dry_run=False,
+                                  warm_start=False, recompute_metrics=False)
+        main.run(args)
+        out_path = self.config['matrix']['out_path']
+        before = pd.read_csv(out_path + '1.csv', index_col=0)
+        # a smaller grid, one split shorter
+        self.config['models'] = {'GaussianNB': None,
+                                 'LogisticRegression': {'penalty': ['l2'], 'C': [1]}}
+        self.config['time']['end_year'] -= 1
+        with open(self.config_path, 'w') as config_file:
+            yaml.safe_dump(self.config, config_file)
+        n_splits = len(main.split_years(self.config['time']))
+        os.remove(out_path + '{}.csv'.format(n_splits + 1))
+        args.recompute_metrics = True
+        for _ in range(2):
+            main.run(args)
+        after = pd.read_csv(out_path + '1.csv', index_col=0)
+        self.assertEqual(list(after['model_name']), ['GaussianNB', 'LogisticRegression'])
+        # the rows move to their place in the smaller grid
+        self.assertEqual(list(after['auc_roc']), list(before['auc_roc'].iloc[[2, 4]]))
+        self.assertFalse(os.path.exists(out_path + '{}.csv'.format(n_splits + 1)))
+        # the recomputed rows replace the stored ones
+        with open(out_path + 'results.jsonl') as store_file:
+            self.assertEqual(sum(1 for _ in store_file), 5 * (n_splits + 1))
+
+    def test_warm_start_keeps_the_columns(self):
+        # two splits, the second training window makes B more frequent
+        # than A and brings the new category C
+        # a decision tree cannot continue a fit, it is fitted from scratch
+        config = synthetic.make_config(os.path.join(self.directory, 'warm.csv'), self.directory,
+                                       dict(WARM_MODELS, DecisionTreeClassifier={'max_depth': [3]}))
+        config['time'].update({'end_year': 2014, 'update_period': 1, 'test_period': 1})
+        config['matrix']['plots'] = ['none']
+        df = synthetic.generate(0.3, config)
+        rng = np.random.RandomState(0)
+        early = (df['year'] <= 2010).values
+        df['license description'] = np.where(
+            early, np.where(rng.rand(len(df)) < 0.6, 'A', 'B'),
+            np.where(rng.rand(len(df)) < 0.9, 'B', 'C'))
+        df.to_csv(config['io']['input_path'], index=False)
+        config_path = os.path.join(self.directory, 'warm.yml')
+        with open(config_path, 'w') as config_file:
+            yaml.safe_dump(config, config_file)
+        self.assertEqual(len(main.split_years(config['time'])), 2)
+        args = argparse.Namespace(config=config_path, workers=1, dry_run=False,
+                                  warm_start=True, recompute_metrics=False)
+        main.run(args)
+        out_path = config['matrix']['out_path']
+        # the warm results are kept apart from those of a cold run
+        self.assertFalse(os.path.exists(out_path + '1.csv'))
+        self.assertEqual(list(pd.read_csv(out_path + '1_warm.csv')['fit_mode']), ['cold'] * 4)
+        self.assertEqual(list(pd.read_csv(out_path + '2_warm.csv')['fit_mode']), ['cold'] + ['warm'] * 3)
+        self.assertEqual(len(os.listdir(out_path + 'warm_start/')), 3)
+        # the warm fits are recomputed on the training rows of their split
+        before = pd.read_csv(out_path + '2_warm.csv', index_col=0)
+        args.recompute_metrics = True
+        main.run(args)
+        pd.testing.assert_frame_equal(pd.read_csv(out_path + '2_warm.csv', index_col=0), before)
+
 if __name__ == '__main__':
     unittest.main()
-           
-        
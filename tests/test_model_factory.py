@@ -5,6 +5,8 @@ from collections import OrderedDict
 import unittest
 from sklearn.linear_model import LogisticRegression
 from sklearn.svm import LinearSVC
+from sklearn.ensemble import GradientBoostingClassifier
+import numpy as np
 from pipeline import model_factory as fa
 import pdb
 
@@ -19,20 +21,53 @@ class TestModelFactory(unittest.TestCase):
     '''
     def test_one_model(self):
         temp = LinearSVC(C=0.1,penalty ='l2').get_params()
-        model = next(fa.get_models(ONE_DICT)).get_params()
+        name, model = next(fa.get_models(ONE_DICT))
+        model = model.get_params()
         self.assertEqual(temp, model, "models don't match")
 
     def test_many_models(self):
         expected = [LinearSVC(C=0.1, penalty = 'l2'),
                   LinearSVC(C=1 , penalty = 'l2'),
-                  LogisticRegression(C = 0.1, penalty = 'l1'),
+                  LogisticRegression(C = 0.1, penalty = 'l1', solver = 'saga'),
                   LogisticRegression(C = 0.1, penalty = 'l2')]
         models = fa.get_models(MANY_DICT)
         i = 0
-        for model in models:
+        for name, model in models:
            self.assertEqual(expected[i].get_params(), model.get_params(), 'Number {} is not match'.format(i+1))
            i += 1
 
+    def test_duplicates_dropped(self):
+        config = {'RandomForestClassifier': {'n_estimators': [10], 'n_jobs': [1, -1]},
+                  'GaussianNB': None}
+        names = [name for name, model in fa.get_models(config)]
+        self.assertEqual(names, ['RandomForestClassifier', 'GaussianNB'])
+
+    def test_invalid_config_fails_first(self):
+        config = {'LogisticRegression': {'penalty': ['l1'], 'solver': ['lbfgs']},
+                  'NotAModel': {}}
+        with self.assertRaises(ValueError) as context:
+            next(fa.get_models(config))
+        self.assertIn('LogisticRegression', str(context.exception))
+        self.assertIn('NotAModel', str(context.exception))
+
+    def test_warm_start_keeps_old_share(self):
+        rng = np.random.RandomState(0)
+        X, y = rng.rand(200, 3), rng.randint(0, 2, 200)
+        previous = GradientBoostingClassifier(n_estimators=10, random_state=0).fit(X[:100], y[:100])
+        model, reused = fa.warm_start_from('GradientBoostingClassifier',
+                                           GradientBoostingClassifier(n_estimators=10, random_state=0),
+                                           previous, 100, 200)
+        self.assertTrue(reused)
+        self.assertEqual(model.estimators_.shape[0], 5)
+        model.fit(X, y)
+        self.assertEqual(model.estimators_.shape[0], 10)
+
+    def test_no_warm_start_on_smaller_window(self):
+        model = LogisticRegression()
+        previous = LogisticRegression().fit(np.eye(2), [0, 1])
+        self.assertEqual(fa.warm_start_from('LogisticRegression', model, previous, 2, 2), (model, False))
+        self.assertEqual(fa.warm_start_from('LinearSVC', model, previous, 1, 2), (model, False))
+
 if __name__ == '__main__':
     unittest.main()
            
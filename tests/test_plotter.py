@@ -0,0 +1,42 @@
+'''
+test code for the plotter.py
+'''
+import os
+import tempfile
+import unittest
+import numpy as np
+from pipeline.plotter import plotter
+
+class TestPlotter(unittest.TestCase):
+    '''
+    unit test for the plot modes
+
+    '''
+    def make_plotter(self, mode, workers):
+        self.directory = tempfile.mkdtemp() + '/'
+        return plotter({'percentage': 30, 'pr_path': self.directory, 'roc_path': self.directory,
+                        'plots': [mode], 'plot_top_n': [2], 'plot_workers': [workers]})
+
+    def add_models(self, plots):
+        rng = np.random.RandomState(0)
+        y_test = rng.randint(0, 2, 100)
+        for index, noise in enumerate([5.0, 0.1, 1.0]):
+            plots.add(1, index, 'model', 'model {}'.format(index), y_test, y_test + noise * rng.rand(100))
+        plots.end_split(1)
+        plots.close()
+
+    def test_top_models_in_pool(self):
+        plots = self.make_plotter('top', 1)
+        self.add_models(plots)
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         ['precision_recall_curve_model_1_1.png', 'precision_recall_curve_model_1_2.png',
+                          'roc_curve__model_1_1.png', 'roc_curve__model_1_2.png'])
+
+    def test_combined_inline(self):
+        plots = self.make_plotter('combined', 0)
+        self.add_models(plots)
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         ['precision_recall_curve_combined_1.png', 'roc_curve_combined_1.png'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+'''
+test code for the result_store.py
+'''
+import os
+import tempfile
+import unittest
+from sklearn.linear_model import LogisticRegression
+from pipeline import result_store
+
+SPLIT = {'train_end': 2010, 'test_years': [2013, 2014]}
+FEATURES = {'cols': {'x_cols': ['ward', 'year']}}
+
+class TestResultStore(unittest.TestCase):
+    '''
+    unit test for the resumable result store
+
+    '''
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), 'results.jsonl')
+
+    def test_key_ignores_n_jobs(self):
+        one = result_store.make_key(SPLIT, FEATURES, 'LogisticRegression', LogisticRegression(C=1))
+        other = result_store.make_key(SPLIT, FEATURES, 'LogisticRegression', LogisticRegression(C=1, n_jobs=4))
+        third = result_store.make_key(SPLIT, FEATURES, 'LogisticRegression', LogisticRegression(C=2))
+        self.assertEqual(one, other)
+        self.assertNotEqual(one, third)
+
+    def test_resume_after_torn_row(self):
+        store = result_store.result_store(self.path)
+        store.append('a', SPLIT, ['LogisticRegression', 'params', 0.5])
+        with open(self.path, 'a') as store_file:
+            store_file.write('{"key": "b", "spl')
+        store = result_store.result_store(self.path)
+        self.assertIn('a', store)
+        self.assertNotIn('b', store)
+        store.append('c', SPLIT, ['LinearSVC', 'params', 0.25])
+        store = result_store.result_store(self.path)
+        self.assertEqual(store.get('c'), ['LinearSVC', 'params', 0.25])
+        self.assertEqual(store.get('a')[2], 0.5)
+
+    def test_upsert_keeps_one_row_per_fit(self):
+        store = result_store.result_store(self.path)
+        store.append('a', SPLIT, ['LogisticRegression', 'params', 0.5])
+        store.append('a', SPLIT, ['LogisticRegression', 'params', 0.6])
+        store.append('b', SPLIT, ['LinearSVC', 'params', 0.25])
+        store.upsert([('b', SPLIT, ['LinearSVC', 'params', 0.3]), ('c', SPLIT, ['GaussianNB', 'params', 0.1])])
+        with open(self.path) as store_file:
+            self.assertEqual(len(store_file.readlines()), 3)
+        store = result_store.result_store(self.path)
+        self.assertEqual([store.get(key)[2] for key in 'abc'], [0.6, 0.3, 0.1])
+
+if __name__ == '__main__':
+    unittest.main()
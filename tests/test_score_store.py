@@ -0,0 +1,48 @@
+'''
+test code for the score_store.py
+'''
+import os
+import tempfile
+import unittest
+import numpy as np
+from pipeline.score_store import score_store
+from pipeline.score_store import INDEX
+
+class TestScoreStore(unittest.TestCase):
+    '''
+    unit test for the stored scores
+
+    '''
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def test_round_trip(self):
+        store = score_store(self.directory)
+        store.put_split({'train_end': 2010}, [0, 1, 1], [10, 11, 12], 40)
+        store.put_split({'train_end': 2012}, [0, 1], [13, 14])
+        store.put('b', 1, {'train_end': 2010}, 1, 'GaussianNB', 'GaussianNB()', [0.2, 0.4, 0.9], [1.5])
+        store.put('a', 1, {'train_end': 2010}, 0, 'GaussianNB', 'GaussianNB()', [0.1, 0.5, 0.7], [np.float64(2)])
+        # the same split number with other boundaries is another split
+        store.put('c', 1, {'train_end': 2011}, 0, 'GaussianNB', 'GaussianNB()', [0.3, 0.5, 0.7], [])
+        reopened = score_store(self.directory)
+        y_test, row_ids = reopened.get_split({'train_end': 2010})
+        self.assertEqual(list(y_test), [0, 1, 1])
+        self.assertEqual(list(row_ids), [10, 11, 12])
+        self.assertIsNone(reopened.get_split({'train_end': 2011}))
+        self.assertEqual(reopened.train_rows({'train_end': 2010}), 40)
+        self.assertIsNone(reopened.train_rows({'train_end': 2012}))
+        self.assertEqual(sorted(reopened.fits({'train_end': 2010})), ['a', 'b'])
+        self.assertEqual(reopened.fits({'train_end': 2010})['a']['tail'], [2.0])
+        np.testing.assert_allclose(reopened.get('b'), [0.2, 0.4, 0.9])
+
+    def test_torn_index_line(self):
+        store = score_store(self.directory)
+        store.put('a', 1, {}, 0, 'GaussianNB', 'GaussianNB()', [0.1], [])
+        with open(os.path.join(self.directory, INDEX), 'a') as index_file:
+            index_file.write('{"key": "b", "spl')
+        reopened = score_store(self.directory)
+        reopened.put('c', 1, {}, 1, 'GaussianNB', 'GaussianNB()', [0.2], [])
+        self.assertEqual(sorted(score_store(self.directory).entries), ['a', 'c'])
+
+if __name__ == '__main__':
+    unittest.main()
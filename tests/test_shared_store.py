@@ -0,0 +1,77 @@
+'''
+test code for the shared_store.py
+'''
+from concurrent.futures import ProcessPoolExecutor
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from pipeline import shared_store
+
+def read_in_worker(handles):
+    # what a pool worker sees of the store, copied back to the parent
+    data = shared_store.attach_all(handles)
+    return dict((name, matrix.toarray() if sparse.issparse(matrix) else np.array(matrix))
+                for name, matrix in data.items())
+
+class TestSharedStore(unittest.TestCase):
+    '''
+    unit test for the memory mapped matrices of a split
+
+    '''
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.dense = pd.DataFrame(rng.rand(20, 3), columns=['a', 'b', 'c'])
+        self.csr = sparse.random(20, 6, density=0.3, format='csr', random_state=rng)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        with shared_store.matrix_store(self.directory) as store:
+            store.put('X_train', self.dense, dtype=np.float32, order='F')
+            store.put('X_test', self.csr)
+            dense = store.get('X_train')
+            self.assertIsInstance(dense, np.memmap)
+            self.assertEqual(dense.dtype, np.float32)
+            self.assertTrue(dense.flags['F_CONTIGUOUS'])
+            self.assertFalse(dense.flags['WRITEABLE'])
+            np.testing.assert_array_equal(dense, self.dense.values.astype(np.float32))
+            csr = store.get('X_test')
+            self.assertTrue(sparse.isspmatrix_csr(csr))
+            # a view of the read-only map, not a copy
+            self.assertFalse(csr.data.flags['WRITEABLE'])
+            np.testing.assert_array_equal(csr.toarray(), self.csr.toarray())
+
+    def test_worker_sees_the_same_data(self):
+        with shared_store.matrix_store(self.directory) as store:
+            store.put('X_train', self.dense)
+            store.put('X_test', self.csr)
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                seen = pool.submit(read_in_worker, store.handles).result()
+        np.testing.assert_array_equal(seen['X_train'], self.dense.values)
+        np.testing.assert_array_equal(seen['X_test'], self.csr.toarray())
+
+    def test_cleanup(self):
+        store = shared_store.matrix_store(self.directory)
+        store.put('X_train', self.dense)
+        private = store.directory
+        self.assertEqual(os.path.dirname(private), self.directory)
+        store.close()
+        self.assertFalse(os.path.exists(private))
+        self.assertEqual(store.handles, {})
+        # a kept store outlives close and is opened again by name
+        kept = os.path.join(self.directory, 'kept')
+        with shared_store.matrix_store(kept, keep=True) as store:
+            store.put('X_train', self.dense)
+            store.put('X_test', self.csr)
+        reopened = shared_store.open_store(kept)
+        self.assertEqual(sorted(reopened.handles), ['X_test', 'X_train'])
+        np.testing.assert_array_equal(reopened.get('X_test').toarray(), self.csr.toarray())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+'''
+test code for the stage_timer.py
+'''
+import json
+import os
+import tempfile
+import unittest
+from pipeline.stage_timer import stage_timer
+
+class TestStageTimer(unittest.TestCase):
+    '''
+    unit test for the structured stage timing log
+
+    '''
+    def test_stages_added_per_split(self):
+        path = os.path.join(tempfile.mkdtemp(), 'timing.jsonl')
+        timer = stage_timer(path)
+        with timer.stage('fit'):
+            pass
+        timer.add('fit', 1.0)
+        timer.add('plots', 2.0)
+        timer.end_split(1)
+        timer.end_run()
+        with open(path) as log_file:
+            lines = [json.loads(line) for line in log_file]
+        self.assertEqual([(line['split'], line['stage']) for line in lines],
+                         [(1, 'fit'), (1, 'plots'), (None, 'total')])
+        self.assertGreaterEqual(lines[0]['seconds'], 1.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+'''
+test code for the temporal_splitter.py
+'''
+import unittest
+import numpy as np
+from pipeline.temporal_splitter import temporal_splitter
+
+TIME_CONFIG = {'start_year': 2009, 'end_year': 2018, 'update_period': 2, 'test_period': 2}
+
+class TestTemporalSplitter(unittest.TestCase):
+    '''
+    unit test for the index based temporal splitter
+
+    '''
+    def test_default_windows(self):
+        infos = temporal_splitter(TIME_CONFIG).split_info()
+        self.assertEqual([info['train_end'] for info in infos], [2010, 2012, 2014])
+        self.assertEqual(infos[0]['test_years'], [2013, 2014])
+
+    def test_periods_from_config(self):
+        config = dict(TIME_CONFIG, update_period=1, test_period=1)
+        infos = temporal_splitter(config).split_info()
+        self.assertEqual([info['train_end'] for info in infos], list(range(2010, 2016)))
+        self.assertEqual(infos[-1]['test_years'], [2018])
+
+    def test_ranges(self):
+        years = np.array([2012, 2009, 2014, 2010, 2013, 2010, 2018, 2017])
+        splitter = temporal_splitter(TIME_CONFIG)
+        order = splitter.fit(years)
+        for split in splitter.splits():
+            train = years[order[split['train'][0]:split['train'][1]]]
+            test = years[order[split['test'][0]:split['test'][1]]]
+            self.assertEqual(sorted(train), sorted(years[years <= split['train_end']]))
+            self.assertEqual(sorted(test), sorted(years[np.isin(years, split['test_years'])]))
+
+if __name__ == '__main__':
+    unittest.main()
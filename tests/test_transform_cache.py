@@ -0,0 +1,80 @@
+'''
+test code for the transform_cache.py
+'''
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from pipeline import transform_cache
+from pipeline.transform_cache import MANIFEST
+
+SPLIT = {'train_end': 2010, 'test_years': [2013, 2014]}
+FEATURES = {'cols': {'x_cols': ['ward', 'year']}, 'transform': {'scale': ['minmax']}}
+
+class TestTransformCache(unittest.TestCase):
+    '''
+    unit test for the cached matrices of the splits
+
+    '''
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.input_path = os.path.join(self.directory, 'data.csv')
+        with open(self.input_path, 'w') as data_file:
+            data_file.write('ward,year\n1,2010\n2,2011\n')
+        self.cache_dir = os.path.join(self.directory, 'cache')
+        self.X_train = np.arange(12, dtype=np.float64).reshape(4, 3)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_entry(self, commit=True):
+        cache = transform_cache.transform_cache(self.cache_dir, self.input_path, FEATURES)
+        store = cache.create(SPLIT)
+        store.put('X_train', self.X_train, order='F')
+        store.put('y_train', np.array([0, 1, 1, 0]))
+        if commit:
+            cache.commit(store, ['a', 'b', 'c'])
+        return store.directory
+
+    def load(self, features=FEATURES, split=SPLIT):
+        return transform_cache.transform_cache(self.cache_dir, self.input_path, features).load(split)
+
+    def test_hit(self):
+        self.write_entry()
+        store = self.load()
+        self.assertEqual(sorted(store.handles), ['X_train', 'y_train'])
+        np.testing.assert_array_equal(store.get('X_train'), self.X_train)
+        self.assertTrue(store.get('X_train').flags['F_CONTIGUOUS'])
+
+    def test_miss_on_change(self):
+        self.write_entry()
+        self.assertIsNone(self.load(dict(FEATURES, transform={'scale': ['none']})))
+        self.assertIsNone(self.load(split=dict(SPLIT, train_end=2011)))
+        with open(self.input_path, 'a') as data_file:
+            data_file.write('3,2012\n')
+        self.assertIsNone(self.load())
+
+    def test_incomplete_entry(self):
+        self.write_entry(commit=False)
+        self.assertIsNone(self.load())
+
+    def test_corrupt_entry(self):
+        directory = self.write_entry()
+        with open(os.path.join(directory, MANIFEST), 'w') as manifest_file:
+            manifest_file.write('{"columns": ["a", "b"')
+        self.assertIsNone(self.load())
+        directory = self.write_entry()
+        os.remove(os.path.join(directory, 'y_train.npy'))
+        self.assertIsNone(self.load())
+        directory = self.write_entry()
+        path = os.path.join(directory, 'X_train.npy')
+        with open(path, 'r+b') as array_file:
+            array_file.truncate(os.path.getsize(path) - 8)
+        self.assertIsNone(self.load())
+        # the entry is written again by the next run
+        self.write_entry()
+        np.testing.assert_array_equal(self.load().get('X_train'), self.X_train)
+
+if __name__ == '__main__':
+    unittest.main()
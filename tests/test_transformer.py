@@ -0,0 +1,51 @@
+'''
+test code for the transformer.py
+'''
+import unittest
+import numpy as np
+import pandas as pd
+import transformer
+
+CONFIG = {'imputation': {'cols': ['ward', 'type'], 'loc_col': ['ward'], 'time_col': ['year']},
+          'dummy': {'cols': ['ward', 'type'], 'k': [2]}}
+
+def make_data(n=200, seed=0):
+    rng = np.random.RandomState(seed)
+    df = pd.DataFrame({'rate': rng.rand(n), 'income': rng.rand(n) * 100,
+                       'ward': rng.randint(1, 5, n), 'type': rng.choice(['a', 'b', 'c'], n),
+                       'year': rng.randint(2009, 2019, n)})
+    df.loc[rng.rand(n) < 0.2, 'rate'] = np.nan
+    df.loc[rng.rand(n) < 0.2, 'income'] = np.nan
+    # a (loc, year) without any rate, imputed with the global mean
+    df.loc[(df['ward'] == 1) & (df['year'] == 2009), 'rate'] = np.nan
+    return df.sort_values('year', kind='mergesort')
+
+class TestTransformer(unittest.TestCase):
+    '''
+    unit test for the incremental transformer
+
+    '''
+    def test_incremental_matches_full(self):
+        df = make_data()
+        incremental = transformer.incremental_transformer(CONFIG)
+        for train_end in (2010, 2012, 2014):
+            X_train = df[df['year'] <= train_end]
+            X_test = df[df['year'].isin([train_end + 3, train_end + 4])]
+            full_train, full_test = transformer.transform(CONFIG, X_train.copy(), X_test.copy())
+            inc_train, inc_test = incremental.transform(X_train, X_test)
+            self.assertEqual(list(full_train.columns), list(inc_train.columns))
+            np.testing.assert_allclose(full_train.values.astype(float), inc_train.values.astype(float))
+            np.testing.assert_allclose(full_test.values.astype(float), inc_test.values.astype(float))
+
+    def test_restart_on_other_window(self):
+        df = make_data()
+        incremental = transformer.incremental_transformer(CONFIG)
+        incremental.transform(df[df['year'] <= 2012], df[df['year'] == 2016])
+        X_train = df[(df['year'] >= 2010) & (df['year'] <= 2013)]
+        X_test = df[df['year'] == 2017]
+        full_train, _ = transformer.transform(CONFIG, X_train.copy(), X_test.copy())
+        inc_train, _ = incremental.transform(X_train, X_test)
+        np.testing.assert_allclose(full_train.values.astype(float), inc_train.values.astype(float))
+
+if __name__ == '__main__':
+    unittest.main()
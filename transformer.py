@@ -8,6 +8,8 @@ import sys
 import numpy as np
 import argparse
 import gc
+import pandas as pd
+from sklearn.preprocessing import MinMaxScaler
 from pipeline.get_dummy import *
 from pipeline.community_mean_imputer import *
 from pipeline.minmax_scaler import *
@@ -26,7 +28,7 @@ def transform(config,X_train,X_test):
     Input: 
         config: OrdedDict with the key as the name of op, value as params
     Return:
-        dataframe
+        dataframes, or scipy csr matrices when dummy sparse is set
     '''
     logger.info('begin to transform')
     #pdb.set_trace()
@@ -38,23 +40,153 @@ def transform(config,X_train,X_test):
     imputer = community_mean_imputer()
     X_train, X_test = imputer.filled_categorical(X_train, X_test, categorical_col)
     X_train = imputer.train_regional_mean(X_train, loc_column, time_column)
-    X_test = imputer.transform_test(X_test, loc_column, time_column) 
-
-    dummies_cols  = config['dummy']['cols']
-    k = config['dummy']['k'][0]
+    X_test = impute_test(config, imputer, X_test)
 
     # Drop year column
     X_train = X_train.drop(columns=[time_column])
     X_test = X_test.drop(columns=[time_column])
         
     #Scaling
-    continuous_columns = list(set(X_train.columns) - set(categorical_col))
+    continuous_columns = get_continuous_columns(config, X_train)
     logger.info('start to scaling')
     X_train, X_test = min_max_transformation(X_train, X_test, continuous_columns)
-    
+    return encode(config, X_train, X_test)
+
+
+def impute_test(config, imputer, X_test):
+    '''
+    impute the test set with a trained imputer
+    Input:
+        config: the transform config
+        imputer: trained community_mean_imputer
+        X_test: test dataframe
+    Return:
+        dataframe
+    '''
+    time_column = config['imputation']['time_col'][0]
+    loc_column = config['imputation']['loc_col'][0]
+    lag = config['imputation'].get('lag', [4])[0]
+    fallback = config['imputation'].get('fallback', ['nearest'])[0]
+    return imputer.transform_test(X_test, loc_column, time_column, lag, fallback)
+
+
+def get_continuous_columns(config, X_train):
+    '''
+    the columns to scale, every column but the categorical ones
+    Input:
+        config: the transform config
+        X_train: training dataframe without the time column
+    Return:
+        list of columns
+    '''
+    categorical_col = config['imputation']['cols']
+    return [col for col in X_train.columns if col not in categorical_col]
+
+
+def encode(config, X_train, X_test, encoders=None):
+    '''
+    convert the categorical columns into dummies
+    Input:
+        config: the transform config
+        X_train, X_test: scaled dataframes
+        encoders: dictionary of fitted top_k_encoder by column to reuse,
+                  None fits them on X_train
+    Return:
+        dataframes, or scipy csr matrices when dummy sparse is set
+    '''
+    dummies_cols  = config['dummy']['cols']
+    k = config['dummy']['k'][0]
     logger.info('start to get dummies')
+    if config['dummy'].get('sparse', [False])[0]:
+        # one sparse design matrix instead of dense int64 dummies
+        return get_sparse_dummies(X_train, X_test, dummies_cols, k, encoders)
     #get dummies
     for col in dummies_cols:
-        X_train, X_test = get_dummies(X_train, X_test, col, k)
+        X_train, X_test = get_dummies(X_train, X_test, col, k,
+                                      encoders[col] if encoders else None)
     gc.collect()
     return X_train, X_test
+
+
+class incremental_transformer():
+
+    '''
+    The class transforms the nested training windows of consecutive splits.
+    The imputation sums and counts and the scaling min and max are updated
+    with the rows each window adds, so a split only imputes its new rows.
+    With frozen encoders the dummies of the first split are kept for every
+    later one, so that the features keep their columns across the splits,
+    a category unseen in the first split falls in the others dummy or in
+    none.
+    '''
+
+    def __init__(self, config, freeze_encoders=False):
+        '''
+        Input:
+            config: the transform config
+            freeze_encoders: fit the dummies on the first split only
+        '''
+        self.config = config
+        self.freeze_encoders = freeze_encoders
+        self.encoders = None
+        self.feature_names = None
+        self.reset()
+
+    def reset(self):
+        '''
+        forget every row seen so far
+        '''
+        self.imputer = community_mean_imputer()
+        self.imputer.filled_category = self.config['imputation']['cols']
+        self.scaler = MinMaxScaler()
+        self.continuous_columns = None
+        self.imputed = None
+
+    def transform(self, X_train, X_test):
+        '''
+        perform all the tranform ops on the data, X_train has to start with
+        the rows of the previous call for them to be reused
+        Input:
+            X_train, X_test: dataframes of the split
+        Return:
+            dataframes, or scipy csr matrices when dummy sparse is set
+        '''
+        time_column = self.config['imputation']['time_col'][0]
+        loc_column = self.config['imputation']['loc_col'][0]
+        n_seen = 0 if self.imputed is None else len(self.imputed)
+        if n_seen and not X_train.index[:n_seen].equals(self.imputed.index):
+            logger.info('the training window does not extend the last one, start over')
+            self.reset()
+            n_seen = 0
+        new_rows = X_train.iloc[n_seen:].copy()
+        if self.imputer.seen_groups(new_rows, loc_column, time_column):
+            logger.info('new rows update fitted (loc, year) means, start over')
+            self.reset()
+            n_seen = 0
+            new_rows = X_train.copy()
+        logger.info('incremental imputation of {} new rows, {} reused'.format(len(new_rows), n_seen))
+
+        if len(new_rows):
+            new_rows = self.imputer.partial_fit(new_rows, loc_column, time_column)
+            self.imputed = new_rows if self.imputed is None else pd.concat([self.imputed, new_rows])
+            # the global mean moved with the new rows
+            self.imputed = self.imputer.refill_global(self.imputed)
+        X_test = impute_test(self.config, self.imputer, X_test.copy())
+
+        X_train = self.imputed.drop(columns=[time_column])
+        X_test = X_test.drop(columns=[time_column])
+        if self.continuous_columns is None:
+            self.continuous_columns = get_continuous_columns(self.config, X_train)
+        logger.info('start to scaling')
+        if len(new_rows):
+            self.scaler.partial_fit(new_rows[self.continuous_columns])
+        X_train, X_test = min_max_apply(self.scaler, X_train, X_test, self.continuous_columns)
+        dummies_cols = self.config['dummy']['cols']
+        if self.encoders is None or not self.freeze_encoders:
+            k = self.config['dummy']['k'][0]
+            self.encoders = dict((col, fit_encoder(X_train, col, k)) for col in dummies_cols)
+        # the encoded columns, the kept columns followed by the dummies
+        self.feature_names = [col for col in X_train.columns if col not in dummies_cols]
+        for col in dummies_cols:
+            self.feature_names.extend(self.encoders[col].get_feature_names())
+        return encode(self.config, X_train, X_test, self.encoders)